@@ -0,0 +1,290 @@
+import os
+import pickle
+import sqlite3
+import stat
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.exceptions import ImproperlyConfigured
+
+# The value goes last: the other columns are then read without walking
+# the overflow pages of a large pickle.
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    'key TEXT PRIMARY KEY, expires REAL, accessed REAL NOT NULL, '
+    'value BLOB NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+)
+# Tmpfs, so the file lives in shared memory and never touches a disk.
+# World-writable: the cache goes into a private directory made there.
+SHARED_MEMORY = '/dev/shm'
+# Files SQLite keeps next to the database.
+SIDECARS = ('-wal', '-shm', '-journal')
+# Reads refresh the access time at most this often, in seconds, so
+# the hot keys are not rewritten on every hit.
+ACCESS_RESOLUTION = 1.0
+# Keys per statement, below SQLite's limit of bound parameters.
+CHUNK = 500
+# Entries are counted once a process has written this share of
+# MAX_ENTRIES since the last count; COUNT(*) reads the whole index.
+CULL_CHECK_DIVISOR = 100
+
+
+def placeholders(values):
+    return ', '.join('?' * len(values))
+
+
+def chunks(keys):
+    for start in range(0, len(keys), CHUNK):
+        yield keys[start:start + CHUNK]
+
+
+class SharedMemoryCache(BaseCache):
+    """Cache shared by all the processes of one host.
+
+    Entries live in an SQLite file, best on tmpfs, that every worker
+    maps into memory, so a page cached or invalidated by one worker is
+    seen by the others. Writes take the file lock, which makes ``add``
+    and ``incr`` atomic across processes. Past MAX_ENTRIES the least
+    recently read entries are evicted first.
+
+    LOCATION is the file path and is required. Values are unpickled, so
+    whoever can write the file runs code in the workers: the directory
+    and the file must belong to the user running the site and be closed
+    to the others, otherwise the cache refuses to open. OPTIONS take
+    MMAP_SIZE in bytes besides the usual MAX_ENTRIES and CULL_FREQUENCY.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        if not location:
+            raise ImproperlyConfigured(
+                'SharedMemoryCache needs the path of its file as LOCATION.'
+            )
+        self.path = location
+        options = params.get('OPTIONS', {})
+        self.mmap_size = int(options.get('MMAP_SIZE', 256 * 1024 * 1024))
+        self._local = threading.local()
+        self._cull_every = max(1, self._max_entries // CULL_CHECK_DIVISOR)
+        self._written = 0
+
+    def _check_private(self, path, forbidden):
+        try:
+            info = os.lstat(path)
+        except FileNotFoundError:
+            return
+        if (
+            stat.S_ISLNK(info.st_mode)
+            or info.st_uid != os.getuid()
+            or info.st_mode & forbidden
+        ):
+            raise ImproperlyConfigured(
+                f'{path} must belong to this user and be closed to the '
+                'others, the cache refuses to open it.'
+            )
+
+    def _create(self):
+        """Creates the file readable by its owner only, in a directory
+        nobody else can write to."""
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, 0o700, exist_ok=True)
+        self._check_private(directory, 0o022)
+        self._check_private(self.path, 0o077)
+        os.close(os.open(
+            self.path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600
+        ))
+        for path in (self.path, *(self.path + end for end in SIDECARS)):
+            self._check_private(path, 0o077)
+
+    @property
+    def _db(self):
+        # A connection must not cross a fork: workers open their own.
+        if getattr(self._local, 'pid', None) != os.getpid():
+            self._create()
+            db = sqlite3.connect(
+                self.path, timeout=10, isolation_level=None,
+            )
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=OFF')
+            db.execute(f'PRAGMA mmap_size={self.mmap_size}')
+            for statement in SCHEMA:
+                db.execute(statement)
+            self._local.db, self._local.pid = db, os.getpid()
+        return self._local.db
+
+    @contextmanager
+    def _writing(self):
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _read(self, keys):
+        """{key: value} of the live entries among ``keys``."""
+
+        now = time.time()
+        rows = [
+            row for chunk in chunks(keys)
+            for row in self._db.execute(
+                'SELECT key, value, expires, accessed FROM cache '
+                f'WHERE key IN ({placeholders(chunk)})',
+                chunk,
+            )
+        ]
+        found, stale = {}, []
+        for key, value, expires, accessed in rows:
+            if expires is not None and expires <= now:
+                continue
+            found[key] = pickle.loads(value)
+            if accessed < now - ACCESS_RESOLUTION:
+                stale.append(key)
+        if stale:
+            with self._writing() as db:
+                for chunk in chunks(stale):
+                    db.execute(
+                        'UPDATE cache SET accessed = ? '
+                        f'WHERE key IN ({placeholders(chunk)})',
+                        [now, *chunk],
+                    )
+        return found
+
+    def _store(self, db, key, value, timeout, now):
+        db.execute(
+            'REPLACE INTO cache (key, value, expires, accessed) '
+            'VALUES (?, ?, ?, ?)',
+            (
+                key,
+                pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                self.get_backend_timeout(timeout),
+                now,
+            ),
+        )
+
+    def _cull(self, db, now, written=1):
+        """Evicts entries past MAX_ENTRIES, counting them only every
+        ``_cull_every`` writes of the process, not on every write."""
+
+        self._written += written
+        if self._written < self._cull_every:
+            return
+        self._written = 0
+        count = db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        count -= db.execute(
+            'DELETE FROM cache WHERE expires <= ?', (now,)
+        ).rowcount
+        if count <= self._max_entries:
+            return
+        if not self._cull_frequency:
+            db.execute('DELETE FROM cache')
+            return
+        db.execute(
+            'DELETE FROM cache WHERE key IN ('
+            'SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+            (count // self._cull_frequency,),
+        )
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        return self._read([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        if not keys:
+            return {}
+        made = {self._key(key, version): key for key in keys}
+        return {
+            made[key]: value for key, value in self._read(list(made)).items()
+        }
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return key in self._read([key])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._writing() as db:
+            self._store(db, key, value, timeout, now)
+            self._cull(db, now)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        with self._writing() as db:
+            for key, value in data.items():
+                self._store(db, self._key(key, version), value, timeout, now)
+            self._cull(db, now, len(data))
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._writing() as db:
+            if db.execute(
+                'SELECT 1 FROM cache WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (key, now),
+            ).fetchone():
+                return False
+            self._store(db, key, value, timeout, now)
+            self._cull(db, now)
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._writing() as db:
+            return db.execute(
+                'UPDATE cache SET expires = ? WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (self.get_backend_timeout(timeout), key, time.time()),
+            ).rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        made = self._key(key, version)
+        with self._writing() as db:
+            row = db.execute(
+                'SELECT value FROM cache WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (made, time.time()),
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            db.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (pickle.dumps(value, pickle.HIGHEST_PROTOCOL), made),
+            )
+        return value
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        with self._writing() as db:
+            db.execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if not keys:
+            return
+        with self._writing() as db:
+            for chunk in chunks(keys):
+                db.execute(
+                    f'DELETE FROM cache WHERE key IN ({placeholders(chunk)})',
+                    chunk,
+                )
+
+    def clear(self):
+        with self._writing() as db:
+            db.execute('DELETE FROM cache')
@@ -0,0 +1,151 @@
+import multiprocessing
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+from core.cache import SHARED_MEMORY
+
+BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'shared': 'core.cache.SharedMemoryCache',
+}
+VERSION_KEY = 'bench:version'
+# Invalidations made by all the workers, shared between the processes.
+writes = None
+
+
+def share(counter):
+    global writes
+    writes = counter
+
+
+def run_worker(backend, location, options, seed):
+    """Serves ``options['requests']`` page requests in one process and
+    returns (hits, stale hits, get timings, set timings).
+
+    A hit is stale when the page was stored before the latest write of
+    any worker, which only a shared cache learns about.
+    """
+
+    random.seed(seed)
+    cache = import_string(BACKENDS[backend])(
+        location, {'OPTIONS': {'MAX_ENTRIES': options['pages'] * 2}}
+    )
+    weights = [
+        rank ** -options['alpha'] for rank in range(1, options['pages'] + 1)
+    ]
+    pages = random.choices(
+        range(options['pages']), weights, k=options['requests']
+    )
+    body = os.urandom(options['size'])
+    hits, stale, gets, sets = 0, 0, [], []
+    for page in pages:
+        if random.random() < options['writes']:
+            # A write elsewhere on the site invalidates every page.
+            with writes.get_lock():
+                writes.value += 1
+            try:
+                cache.incr(VERSION_KEY)
+            except ValueError:
+                cache.add(VERSION_KEY, 1, None)
+            continue
+        generation = writes.value
+        started = time.perf_counter()
+        version = cache.get(VERSION_KEY, 0)
+        key = f'bench:page:{version}:{page}'
+        cached = cache.get(key)
+        gets.append(time.perf_counter() - started)
+        if cached is not None:
+            hits += 1
+            stale += cached[0] < generation
+            continue
+        started = time.perf_counter()
+        cache.set(key, (generation, body), 600)
+        sets.append(time.perf_counter() - started)
+    return hits, stale, gets, sets
+
+
+class Command(BaseCommand):
+    help = (
+        'Serves a power-law page workload from several worker processes '
+        'against the local-memory, file-based and shared-memory cache '
+        'backends and reports the hit rate and latency of each.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, nargs='+', default=[1, 2, 4, 8],
+            help='Numbers of worker processes to try.',
+        )
+        parser.add_argument(
+            '--requests', type=int, default=5_000,
+            help='Requests per worker.',
+        )
+        parser.add_argument('--pages', type=int, default=2_000)
+        parser.add_argument(
+            '--alpha', type=float, default=1.1,
+            help='Power-law exponent of the page popularity.',
+        )
+        parser.add_argument(
+            '--size', type=int, default=30_000,
+            help='Bytes of a cached page.',
+        )
+        parser.add_argument(
+            '--writes', type=float, default=0.001,
+            help='Share of requests that invalidate every page.',
+        )
+        parser.add_argument(
+            '--backends', nargs='+', choices=BACKENDS, default=list(BACKENDS),
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{"backend":<8} {"workers":>7} {"hit rate":>8} {"stale":>6} '
+            f'{"get p50":>9} {"get p99":>9} {"set p50":>9} {"req/s":>8}'
+        )
+        for backend in options['backends']:
+            for workers in options['workers']:
+                self.run(backend, workers, options)
+
+    def run(self, backend, workers, options):
+        # Both file stores on tmpfs, so only the design differs.
+        directory = tempfile.mkdtemp(
+            dir=SHARED_MEMORY if os.path.isdir(SHARED_MEMORY) else None
+        )
+        location = {
+            'locmem': 'bench',
+            'file': directory,
+            'shared': os.path.join(directory, 'cache.sqlite3'),
+        }[backend]
+        context = multiprocessing.get_context('fork')
+        started = time.perf_counter()
+        try:
+            with context.Pool(
+                workers, share, (context.Value('q', 0),)
+            ) as pool:
+                results = pool.starmap(run_worker, [
+                    (backend, location, options, seed)
+                    for seed in range(workers)
+                ])
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        elapsed = time.perf_counter() - started
+        hits = sum(result[0] for result in results)
+        stale = sum(result[1] for result in results)
+        gets = [timing for result in results for timing in result[2]]
+        sets = [timing for result in results for timing in result[3]]
+        percentiles = statistics.quantiles(gets, n=100)
+        self.stdout.write(
+            f'{backend:<8} {workers:>7} {hits / len(gets):>8.1%} '
+            f'{stale / max(hits, 1):>6.1%} '
+            f'{percentiles[49] * 1e6:>7.0f}µs {percentiles[98] * 1e6:>7.0f}µs '
+            f'{statistics.median(sets or [0]) * 1e6:>7.0f}µs '
+            f'{workers * options["requests"] / elapsed:>8.0f}'
+        )
@@ -0,0 +1,46 @@
+import re
+from contextlib import contextmanager
+from urllib.parse import parse_qsl, urlencode
+
+from django.template.loader import render_to_string
+
+MARKER = '<!--personal:{}?{}-->'
+MARKER_RE = re.compile(r'<!--personal:([\w/.-]+)\?([^>]*)-->')
+
+
+@contextmanager
+def deferred(request):
+    """Makes ``{% personal %}`` fragments render as markers.
+
+    A page rendered for ``request`` inside the block is the same for
+    every user and can be cached once; ``personalize`` fills it in.
+    """
+
+    request.personalize_later = True
+    try:
+        yield
+    finally:
+        request.personalize_later = False
+
+
+def is_deferred(request):
+    return getattr(request, 'personalize_later', False)
+
+
+def marker(template_name, params):
+    return MARKER.format(template_name, urlencode(params))
+
+
+def render_fragment(template_name, params, request):
+    return render_to_string(template_name, params, request=request)
+
+
+def personalize(content, request):
+    """Renders the per-user fragments into a shared page body."""
+
+    def fragment(match):
+        return render_fragment(
+            match.group(1), dict(parse_qsl(match.group(2))), request
+        )
+
+    return MARKER_RE.sub(fragment, content.decode()).encode()
@@ -0,0 +1,101 @@
+import logging
+import sys
+import time
+from collections import Counter
+from functools import wraps
+
+from django.conf import settings
+from django.db import connection
+from django.template.base import Template
+
+logger = logging.getLogger(__name__)
+# Queries run outside of any template are put down to the view.
+VIEW = '<view>'
+
+
+def query_budget(limit):
+    """Declares how many SQL queries a view may run per request.
+
+    Used in the URL configurations: ``query_budget(8)(views.index)``.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            return view(*args, **kwargs)
+        wrapper.query_budget = limit
+        return wrapper
+    return decorator
+
+
+def _rendering_template():
+    """Name of the innermost template being rendered, if any."""
+
+    frame = sys._getframe(2)
+    while frame is not None:
+        template = frame.f_locals.get('self')
+        # type(), not isinstance(): lazy objects like request.user would
+        # be evaluated and run a query of their own.
+        if issubclass(type(template), Template):
+            return template.name or VIEW
+        frame = frame.f_back
+    return VIEW
+
+
+class QueryLog:
+    """Records every query run through the connection it is wrapped in."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((
+                sql, time.perf_counter() - started, _rendering_template()
+            ))
+
+    def __len__(self):
+        return len(self.queries)
+
+    def by_template(self):
+        return Counter(template for _, _, template in self.queries)
+
+
+class QueryBudgetMiddleware:
+    """Counts the queries of each request against the view's budget.
+
+    The log is left on ``request.query_log`` for tests; a request going
+    over the budget of its view is logged with the per-template counts.
+    Finding the template walks the stack on every query, so requests
+    are only counted with QUERY_BUDGET_CHECKS on, read per request so
+    tests can switch it.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.QUERY_BUDGET_CHECKS:
+            return self.get_response(request)
+        request.query_log = QueryLog()
+        with connection.execute_wrapper(request.query_log):
+            response = self.get_response(request)
+        budget = getattr(request, 'query_budget', None)
+        if budget is not None and len(request.query_log) > budget:
+            logger.warning(
+                '%s ran %d queries, budget is %d: %s',
+                request.path,
+                len(request.query_log),
+                budget,
+                ', '.join(
+                    f'{template} {count}' for template, count
+                    in request.query_log.by_template().most_common()
+                ),
+            )
+        return response
+
+    def process_view(self, request, view, view_args, view_kwargs):
+        request.query_budget = getattr(view, 'query_budget', None)
@@ -0,0 +1,53 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.db import connections
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from .cache import SHARED_MEMORY
+
+
+class TestRunner(DiscoverRunner):
+    """Runs the tests with the shared cache in a private directory made
+    for the run, so they neither read nor wipe the cache of a running
+    site, and two runs never share one.
+
+    SQLite test databases go there too, as files: an in-memory database
+    locks whole tables, so tests reading from a second connection while
+    a transaction is open could not run against it.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.directory = tempfile.mkdtemp(
+            prefix='yatube-tests-',
+            dir=SHARED_MEMORY if os.path.isdir(SHARED_MEMORY) else None,
+        )
+        caches = {
+            alias: {
+                **params,
+                'LOCATION': os.path.join(
+                    self.directory, f'cache-{alias}.sqlite3'
+                ),
+            }
+            for alias, params in settings.CACHES.items()
+        }
+        self.private_caches = override_settings(CACHES=caches)
+        self.private_caches.enable()
+
+    def setup_databases(self, **kwargs):
+        for connection in connections.all():
+            test = connection.settings_dict['TEST']
+            if connection.vendor == 'sqlite' and not test['NAME']:
+                test['NAME'] = os.path.join(
+                    self.directory, f'db-{connection.alias}.sqlite3'
+                )
+        return super().setup_databases(**kwargs)
+
+    def teardown_test_environment(self, **kwargs):
+        self.private_caches.disable()
+        shutil.rmtree(self.directory, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,45 @@
+from django import template
+from django.template.base import token_kwargs
+
+from core.personal import is_deferred, marker, render_fragment
+
+register = template.Library()
+
+
+class PersonalNode(template.Node):
+    def __init__(self, template_name, params):
+        self.template_name = template_name
+        self.params = params
+
+    def render(self, context):
+        template_name = self.template_name.resolve(context)
+        params = {
+            name: str(value.resolve(context))
+            for name, value in self.params.items()
+        }
+        request = context.get('request')
+        if request is not None and is_deferred(request):
+            return marker(template_name, params)
+        return render_fragment(template_name, params, request)
+
+
+@register.tag
+def personal(parser, token):
+    """Includes a per-user fragment: {% personal "name.html" key=value %}.
+
+    The fragment sees the request context and the params as strings.
+    Inside a shared cached page it is left as a marker and rendered for
+    each visitor after the page is taken from the cache.
+    """
+
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(
+            f'{bits[0]} tag takes a template name.'
+        )
+    params = token_kwargs(bits[2:], parser, support_legacy=False)
+    if len(params) != len(bits) - 2:
+        raise template.TemplateSyntaxError(
+            f'{bits[0]} tag takes only key=value params.'
+        )
+    return PersonalNode(parser.compile_filter(bits[1]), params)
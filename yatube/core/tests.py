@@ -1,6 +1,21 @@
 from http import HTTPStatus
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
 
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.core.exceptions import ImproperlyConfigured
+from django.test import (
+    RequestFactory, SimpleTestCase, TestCase, override_settings
+)
+
+from .cache import SharedMemoryCache
+from .queries import QueryBudgetMiddleware, query_budget
+
+User = get_user_model()
 
 
 class ViewTestClass(TestCase):
@@ -11,3 +26,129 @@ class ViewTestClass(TestCase):
         response = self.client.get('/unexisting_page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+@override_settings(QUERY_BUDGET_CHECKS=True)
+class QueryBudgetMiddlewareTests(TestCase):
+    def test_going_over_the_budget_is_logged(self):
+        """A view running more queries than declared logs a warning."""
+
+        @query_budget(1)
+        def view(request):
+            User.objects.count()
+            User.objects.exists()
+            return HttpResponse()
+
+        request = RequestFactory().get('/budget/')
+        middleware = QueryBudgetMiddleware(
+            lambda request: middleware.process_view(request, view, (), {})
+            or view(request)
+        )
+        with self.assertLogs('core.queries', 'WARNING') as logs:
+            middleware(request)
+        self.assertEqual(len(request.query_log), 2)
+        self.assertIn('/budget/ ran 2 queries, budget is 1', logs.output[0])
+
+    @override_settings(QUERY_BUDGET_CHECKS=False)
+    def test_checks_are_off_outside_development(self):
+        request = RequestFactory().get('/budget/')
+        QueryBudgetMiddleware(lambda request: HttpResponse())(request)
+        self.assertFalse(hasattr(request, 'query_log'))
+
+
+def increment(location, times):
+    cache = SharedMemoryCache(location, {})
+    for _ in range(times):
+        cache.incr('hits')
+
+
+class SharedMemoryCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = SharedMemoryCache(
+            self.location, {'OPTIONS': {'MAX_ENTRIES': 9}}
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_entries_are_shared_between_instances(self):
+        response = HttpResponse('Cached page')
+        self.cache.set('page', response)
+        other = SharedMemoryCache(self.location, {})
+        self.assertEqual(other.get('page').content, b'Cached page')
+        self.assertFalse(other.add('page', 'Another page'))
+        self.assertEqual(
+            other.get_many(['page', 'missing']).keys(), {'page'}
+        )
+        other.delete_many(['page'])
+        self.assertIsNone(self.cache.get('page'))
+
+    def test_expired_entries_are_gone(self):
+        self.cache.set('short', 'lived', 0.01)
+        self.cache.set('long', 'lived', None)
+        time.sleep(0.02)
+        self.assertIsNone(self.cache.get('short'))
+        self.assertTrue(self.cache.add('short', 'again'))
+        with self.assertRaises(ValueError):
+            self.cache.incr('expired', 1)
+        self.assertEqual(self.cache.get('long'), 'lived')
+
+    def test_least_recently_read_entries_are_evicted(self):
+        for number in range(9):
+            self.cache.set(number, number)
+        # Reads newer than the access resolution.
+        self.cache._db.execute('UPDATE cache SET accessed = accessed - 10')
+        self.cache.get(0)
+        self.cache.set('newest', 10)
+        self.assertEqual(self.cache.get(0), 0)
+        self.assertIsNone(self.cache.get(1))
+        self.assertIsNone(self.cache.get(2))
+        self.assertEqual(self.cache.get(8), 8)
+
+    def test_entries_are_counted_once_per_share_of_max_entries(self):
+        cache = SharedMemoryCache(
+            self.location, {'OPTIONS': {'MAX_ENTRIES': 300}}
+        )
+        statements = []
+        cache._db.set_trace_callback(statements.append)
+        for number in range(6):
+            cache.set(number, number)
+        self.assertEqual(
+            len([sql for sql in statements if 'COUNT(*)' in sql]), 2
+        )
+
+    def test_file_is_closed_to_other_users(self):
+        self.cache.set('key', 'value')
+        self.assertEqual(os.stat(self.location).st_mode & 0o777, 0o600)
+
+    def test_location_others_can_reach_is_refused(self):
+        """Values are unpickled, a file others can write runs their code."""
+
+        self.cache.set('key', 'value')
+        for path, mode in (
+            (self.location, 0o644),
+            (self.directory, 0o777),
+        ):
+            with self.subTest(path=path):
+                os.chmod(path, mode)
+                with self.assertRaises(ImproperlyConfigured):
+                    SharedMemoryCache(self.location, {}).get('key')
+                os.chmod(path, 0o700 if path == self.directory else 0o600)
+        with self.assertRaises(ImproperlyConfigured):
+            SharedMemoryCache('', {})
+
+    def test_increments_are_atomic_across_processes(self):
+        self.cache.set('hits', 0)
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=increment, args=(self.location, 200))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('hits'), 800)
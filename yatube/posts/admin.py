@@ -1,17 +1,39 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import SEARCH_VAR
 
-from .models import Post, Group, Follow, Comment
+from .models import Post, Group, Follow, Comment, ImageJob
+from .search import search
 
 
 class PostAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'text', 'pub_date', 'author', 'group')
+    list_display = (
+        'pk', 'text', 'pub_date', 'author', 'group', 'comments_count'
+    )
     list_editable = ('group',)
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-empty-'
 
+    def get_search_results(self, request, queryset, search_term):
+        """Full-text search through the index instead of a LIKE scan."""
+
+        if not search_term:
+            return queryset, False
+        return search(search_term, queryset), False
+
+    def get_ordering(self, request):
+        if request.GET.get(SEARCH_VAR):
+            return ('-search_rank',)
+        return super().get_ordering(request)
+
+
+class ImageJobAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'post', 'status', 'created', 'processed')
+    list_filter = ('status',)
+
 
 admin.site.register(Post, PostAdmin)
+admin.site.register(ImageJob, ImageJobAdmin)
 admin.site.register(Group)
 admin.site.register(Comment)
 admin.site.register(Follow)
@@ -3,3 +3,13 @@ from django.apps import AppConfig
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        from django.conf import settings
+        from django.core.signals import request_started
+
+        from . import signals  # noqa: F401
+        from .warmup import warm_after_startup
+
+        if settings.CACHE_WARM_ON_STARTUP:
+            request_started.connect(warm_after_startup)
@@ -0,0 +1,358 @@
+import math
+import random
+import time
+from collections import namedtuple
+from functools import wraps
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from core.personal import deferred, personalize
+from .models import Follow, Post
+
+VERSION_KEY = 'posts:version:{}'
+PAGE_KEY = 'posts:page:{}:{}'
+LOCK_KEY = 'posts:page-lock:{}'
+STATS_KEY = 'posts:cache:{}:{}'
+POST_AUTHOR_KEY = 'posts:post-author:{}:{}'
+FOLLOWING_KEY = 'posts:following:{}'
+HIT, MISS = 'hit', 'miss'
+# XFetch weight: above 1 recomputes a page earlier before it expires.
+EARLY_EXPIRY_BETA = 1.0
+# Bumped by rare site-wide changes: users and groups show on every page.
+SITE = 'site'
+
+
+def _fresh_version():
+    """A version that can't collide with one issued before an eviction."""
+
+    return time.time_ns()
+
+
+def versions(*scopes):
+    """Current version of every scope, issuing new ones where missing.
+
+    The missing versions are stored in one batch. A concurrent request
+    issuing the same ones overwrites them with other fresh numbers,
+    which only costs a cache miss, never a stale page.
+    """
+
+    keys = [VERSION_KEY.format(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    missing = {key: _fresh_version() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return [found[key] for key in keys]
+
+
+def bump(*scopes):
+    """Invalidates everything cached under the given scopes."""
+
+    for scope in scopes:
+        key = VERSION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _fresh_version(), None)
+
+
+def reset(*scopes):
+    """Invalidates like ``bump``, in a single cache call however many
+    scopes there are: a missing version is issued afresh."""
+
+    cache.delete_many([VERSION_KEY.format(scope) for scope in scopes])
+
+
+def count(name, outcome):
+    key = STATS_KEY.format(name, outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, None)
+
+
+def stats(*names):
+    """{name: (hits, misses)} for the given cached page names."""
+
+    keys = [
+        STATS_KEY.format(name, outcome)
+        for name in names for outcome in (HIT, MISS)
+    ]
+    found = cache.get_many(keys)
+    return {
+        name: (
+            found.get(STATS_KEY.format(name, HIT), 0),
+            found.get(STATS_KEY.format(name, MISS), 0),
+        )
+        for name in names
+    }
+
+
+def group_scope(slug):
+    return f'group:{slug}'
+
+
+def author_scope(username):
+    return f'author:{username}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def feed_scope(user_id):
+    return f'feed:{user_id}'
+
+
+def feed_author_scope(author_id):
+    return f'feed-author:{author_id}'
+
+
+def post_page_scopes(post, *group_slugs):
+    """Scopes of the pages showing ``post``, the feeds of its author's
+    followers included; ``group_slugs`` add groups it just left."""
+
+    if post.group_id is not None:
+        group_slugs += (post.group.slug,)
+    return [
+        'index',
+        post_scope(post.pk),
+        author_scope(post.author.username),
+        feed_author_scope(post.author_id),
+        *(group_scope(slug) for slug in group_slugs if slug),
+    ]
+
+
+def post_author(post_id):
+    """Username of the post author, remembered until a site change."""
+
+    key = POST_AUTHOR_KEY.format(*versions(SITE), post_id)
+    username = cache.get(key)
+    if username is None:
+        username = Post.objects.filter(pk=post_id).values_list(
+            'author__username', flat=True
+        ).first()
+        if username is not None:
+            cache.set(key, username, settings.CACHE_TIME_TO_LIVE)
+    return username
+
+
+def followed_authors(user_id):
+    """Ids of the authors the user follows, loaded once and remembered
+    until the user subscribes or unsubscribes."""
+
+    key = FOLLOWING_KEY.format(user_id)
+    authors = cache.get(key)
+    if authors is None:
+        authors = frozenset(Follow.objects.filter(
+            user_id=user_id
+        ).values_list('author_id', flat=True))
+        cache.set(key, authors, settings.CACHE_TIME_TO_LIVE)
+    return authors
+
+
+def forget_followed(user_id):
+    cache.delete(FOLLOWING_KEY.format(user_id))
+
+
+def feed_scopes(user_id):
+    """Scopes of the subscription feed: the user's subscriptions and
+    the posts of every followed author.
+
+    A post write bumps the one scope of its author, which every
+    follower's feed checks on reading, instead of a scope per follower.
+    """
+
+    return [
+        feed_scope(user_id),
+        *(feed_author_scope(pk) for pk in sorted(followed_authors(user_id))),
+    ]
+
+
+def feed_version(request):
+    """A digest of the versions of the feed scopes, changed by any
+    write to the feed; it keys the cached feed length.
+
+    The versions ``conditional_page`` checked the request against are
+    reused, so the followed authors are looked up once per request.
+    """
+
+    numbers = getattr(request, 'page_versions', None) or versions(
+        SITE, *feed_scopes(request.user.pk)
+    )
+    digest = '|'.join(str(number) for number in numbers)
+    return md5(digest.encode()).hexdigest()
+
+
+def post_detail_scopes(post_id):
+    username = post_author(post_id)
+    if username is None:
+        return [post_scope(post_id)]
+    return [post_scope(post_id), author_scope(username)]
+
+
+# A response with the scope versions it was built from, its expiry time
+# and how long it took to render.
+CachedPage = namedtuple('CachedPage', 'numbers expires delta response')
+
+
+def page_key(request, name):
+    path = md5(request.get_full_path().encode()).hexdigest()
+    return PAGE_KEY.format(name, path)
+
+
+def is_fresh(page, numbers):
+    """Whether the cached page is current and stays in use.
+
+    Probabilistic early expiry (XFetch): each request may decide to
+    rebuild the page before it expires, the likelier the nearer the
+    expiry and the slower the render, so it is rarely rebuilt by many
+    requests at once.
+    """
+
+    early = page.delta * EARLY_EXPIRY_BETA * -math.log(1 - random.random())
+    return page.numbers == numbers and time.time() + early < page.expires
+
+
+def page_etag(request, numbers):
+    """ETag of the page built from the given scope versions.
+
+    The versions change on every write the page depends on, unlike the
+    latest publication date, which an edit or a deletion keeps. The
+    visitor and their CSRF cookie are part of the tag, since the page
+    holds personal fragments and forms.
+    """
+
+    visitor = '|'.join((
+        request.get_full_path(),
+        str(request.user.pk),
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+        *(str(number) for number in numbers),
+    ))
+    return f'"{md5(visitor.encode()).hexdigest()}"'
+
+
+def not_modified(request, etag):
+    """A 304 response if the client holds the page tagged ``etag``."""
+
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        tag(response, etag)
+    return response
+
+
+def tag(response, etag):
+    """Makes the browser revalidate the page by its ETag every time."""
+
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def conditional_page(scopes):
+    """Answers 304 Not Modified while the page's scopes keep their
+    versions, without running the view.
+
+    For pages that are not cached whole; ``scopes`` maps the request
+    and the view arguments to the scopes besides SITE. The versions are
+    left on ``request.page_versions`` for the view.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            request.page_versions = versions(
+                SITE, *scopes(request, *args, **kwargs)
+            )
+            etag = page_etag(request, request.page_versions)
+            return not_modified(request, etag) or tag(
+                view(request, *args, **kwargs), etag
+            )
+        return wrapper
+    return decorator
+
+
+def serve(request, response, outcome, etag):
+    response.content = personalize(response.content, request)
+    response['X-Cache'] = outcome
+    return tag(response, etag)
+
+
+def cached_page(name, scopes=None):
+    """Caches a view's response until one of its scopes is bumped.
+
+    ``scopes`` maps the view arguments to the version scopes the page
+    depends on besides SITE and defaults to the page name. Signals in
+    ``posts.signals`` bump the scopes once every relevant write commits,
+    so the timeout only bounds memory use.
+
+    The page is rendered with ``{% personal %}`` fragments deferred, so
+    one cached copy serves every visitor; the fragments are rendered
+    for the current user after the copy is taken from the cache.
+    A client that already holds the current page gets 304 Not Modified
+    before the cache is even read.
+
+    An outdated page is rebuilt by one request at a time: the request
+    holding the lock renders it, while the concurrent ones are served
+    the previous copy marked ``X-Cache: STALE``. With
+    CACHE_STALE_WHILE_REVALIDATE on, fresh content may thus show up to
+    one render late, or CACHE_LOCK_TIMEOUT late if the holder crashes.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            numbers = versions(
+                SITE, *(scopes(*args, **kwargs) if scopes else [name])
+            )
+            etag = page_etag(request, numbers)
+            response = not_modified(request, etag)
+            if response is not None:
+                count(name, HIT)
+                return response
+            key = page_key(request, name)
+            page = cache.get(key)
+            if page is not None and is_fresh(page, numbers):
+                count(name, HIT)
+                return serve(request, page.response, 'HIT', etag)
+            locked = False
+            if page is not None and settings.CACHE_STALE_WHILE_REVALIDATE:
+                locked = cache.add(
+                    LOCK_KEY.format(key), True, settings.CACHE_LOCK_TIMEOUT
+                )
+                if not locked:
+                    count(name, HIT)
+                    return serve(
+                        request,
+                        page.response,
+                        'STALE',
+                        page_etag(request, page.numbers),
+                    )
+            count(name, MISS)
+            try:
+                started = time.perf_counter()
+                with deferred(request):
+                    response = view(request, *args, **kwargs)
+                if response.streaming:
+                    return response
+                if response.status_code == 200 and not response.cookies:
+                    cache.set(key, CachedPage(
+                        numbers,
+                        time.time() + settings.CACHE_TIME_TO_LIVE,
+                        time.perf_counter() - started,
+                        response,
+                    ), settings.CACHE_TIME_TO_LIVE)
+            finally:
+                if locked:
+                    cache.delete(LOCK_KEY.format(key))
+            return serve(request, response, 'MISS', etag)
+        return wrapper
+    return decorator
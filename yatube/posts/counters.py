@@ -0,0 +1,84 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import AuthorStats, Comment, Follow, Post, User
+
+
+def _total(queryset, field):
+    """Correlated COUNT subquery of ``queryset`` rows per outer pk."""
+
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def _stats_rows(users):
+    return users.annotate(
+        posts_total=_total(Post.objects.all(), 'author'),
+        followers_total=_total(Follow.objects.all(), 'author'),
+        following_total=_total(Follow.objects.all(), 'user'),
+    ).values_list('pk', 'posts_total', 'followers_total', 'following_total')
+
+
+def change_author_stats(user_id, **deltas):
+    """Adds ``deltas`` to the user's counters in a single UPDATE.
+
+    A user without a stats row yet gets one counted from scratch when
+    a counter grows; a counter never drops below zero, drift in either
+    direction is left to ``recount``.
+    """
+
+    updated = AuthorStats.objects.filter(
+        user_id=user_id,
+        **{f'{field}__gte': -delta
+           for field, delta in deltas.items() if delta < 0},
+    ).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+    if not updated and all(delta > 0 for delta in deltas.values()):
+        recount_users(User.objects.filter(pk=user_id))
+
+
+def change_comments_count(post_id, delta):
+    Post.objects.filter(pk=post_id, comments_count__gte=-delta).update(
+        comments_count=F('comments_count') + delta
+    )
+
+
+def recount_users(users):
+    for pk, posts, followers, following in _stats_rows(users).iterator():
+        AuthorStats.objects.update_or_create(
+            user_id=pk,
+            defaults={
+                'posts_count': posts,
+                'followers_count': followers,
+                'following_count': following,
+            },
+        )
+
+
+def recount():
+    """Rebuilds every counter, returns (users, posts) recounted."""
+
+    AuthorStats.objects.all().delete()
+    stats = AuthorStats.objects.bulk_create(
+        AuthorStats(
+            user_id=pk,
+            posts_count=posts,
+            followers_count=followers,
+            following_count=following,
+        ) for pk, posts, followers, following
+        in _stats_rows(User.objects.all()).iterator()
+    )
+    posts = Post.objects.update(
+        comments_count=_total(Comment.objects.all(), 'post')
+    )
+    return len(stats), posts
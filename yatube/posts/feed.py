@@ -0,0 +1,60 @@
+from django.conf import settings
+
+from .models import FeedEntry, Follow, Post
+from .utils import batched
+
+
+def fan_out_post(post):
+    """Puts a freshly published post into every follower's feed."""
+
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    entries = (FeedEntry(
+        user_id=user_id,
+        post_id=post.pk,
+        author_id=post.author_id,
+        pub_date=post.pub_date,
+    ) for user_id in followers.iterator())
+    for batch in batched(entries, settings.FEED_BATCH_SIZE):
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def subscribe(user_id, author_id):
+    """Copies all author's posts into the subscriber's feed."""
+
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date'
+    )
+    entries = (FeedEntry(
+        user_id=user_id,
+        post_id=post_id,
+        author_id=author_id,
+        pub_date=pub_date,
+    ) for post_id, pub_date in posts.iterator())
+    for batch in batched(entries, settings.FEED_BATCH_SIZE):
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def unsubscribe(user_id, author_id):
+    """Removes author's posts from the former subscriber's feed."""
+
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild():
+    """Fills the feed table from scratch, returns the number of rows."""
+
+    FeedEntry.objects.all().delete()
+    rows = Post.objects.filter(author__following__isnull=False).values_list(
+        'author__following__user', 'pk', 'author_id', 'pub_date'
+    )
+    entries = (FeedEntry(
+        user_id=user_id,
+        post_id=post_id,
+        author_id=author_id,
+        pub_date=pub_date,
+    ) for user_id, post_id, author_id, pub_date in rows.iterator())
+    for batch in batched(entries, settings.FEED_BATCH_SIZE):
+        FeedEntry.objects.bulk_create(batch)
+    return FeedEntry.objects.count()
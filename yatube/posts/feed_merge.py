@@ -0,0 +1,129 @@
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import SITE, followed_authors, versions
+from .models import Post
+from .objects import cached_posts
+from .utils import batched
+
+RECENT_KEY = 'posts:recent:{}:{}'
+# Authors per query, below the bound parameter limits of the backends.
+CHUNK = 500
+# The newest posts of every author; Django 2.2 can't filter on a window
+# function, so it goes into the WHERE clause as raw SQL.
+RECENT_SQL = (
+    '{table}.id IN (SELECT id FROM ('
+    'SELECT id, ROW_NUMBER() OVER ('
+    'PARTITION BY author_id ORDER BY pub_date DESC, id DESC'
+    ') AS position FROM {table} WHERE author_id IN ({authors})'
+    ') AS recent WHERE position <= %s)'
+)
+
+
+def _load_recent(author_ids, depth):
+    """{author_id: (complete, entries)} read with one query per CHUNK
+    authors; one row past ``depth`` tells whether a list is complete."""
+
+    recent = {pk: [] for pk in author_ids}
+    for chunk in batched(author_ids, CHUNK):
+        sql = RECENT_SQL.format(
+            table=Post._meta.db_table,
+            authors=', '.join(['%s'] * len(chunk)),
+        )
+        rows = Post.objects.extra(
+            where=[sql], params=[*chunk, depth + 1]
+        ).order_by('author_id', '-pub_date', '-pk').values_list(
+            'author_id', 'pub_date', 'pk'
+        )
+        for author_id, pub_date, pk in rows.iterator():
+            recent[author_id].append((pub_date, pk))
+    return {
+        pk: (len(entries) <= depth, entries[:depth])
+        for pk, entries in recent.items()
+    }
+
+
+def recent_posts(author_ids):
+    """{author_id: (complete, [(pub_date, pk), ...])} of the newest
+    FEED_RECENT_POSTS posts of every author, newest first.
+
+    ``complete`` is false when the author has written more posts than
+    the list holds. The lists live in the cache until the author
+    publishes or deletes a post.
+    """
+
+    version, = versions(SITE)
+    keys = {RECENT_KEY.format(version, pk): pk for pk in author_ids}
+    found = {
+        keys[key]: recent for key, recent in cache.get_many(list(keys)).items()
+    }
+    missing = [pk for pk in keys.values() if pk not in found]
+    if missing:
+        loaded = _load_recent(missing, settings.FEED_RECENT_POSTS)
+        cache.set_many({
+            RECENT_KEY.format(version, pk): recent
+            for pk, recent in loaded.items()
+        }, settings.CACHE_TIME_TO_LIVE)
+        found.update(loaded)
+    return found
+
+
+def forget_recent(author_id):
+    version, = versions(SITE)
+    cache.delete(RECENT_KEY.format(version, author_id))
+
+
+def merge(lists, start, stop):
+    """Post ids of the items ``start:stop`` of the merged ``lists`` of
+    (complete, entries), newest first.
+
+    The heap holds one entry per list and only ``stop`` items are ever
+    taken. Past the last entry of an incomplete list the order is
+    unknown, so None is returned when the slice reaches that far.
+    """
+
+    floor = max(
+        (entries[-1] for complete, entries in lists if not complete),
+        default=None,
+    )
+    items = list(islice(
+        heapq.merge(*(entries for _, entries in lists), reverse=True),
+        start, stop,
+    ))
+    if floor is not None and (
+        len(items) < stop - start or items and items[-1] < floor
+    ):
+        return None
+    return [pk for _, pk in items]
+
+
+class MergedFeed:
+    """The posts of the authors a user follows, newest first, merged on
+    reading from the cached recent posts of every author.
+
+    An object list for the paginator: slicing runs the merge and takes
+    the posts from the object cache. Slices deeper than the recent
+    lists reach are read from ``fallback``, the same list as a queryset.
+    """
+
+    def __init__(self, user_id, fallback):
+        self.user_id = user_id
+        self.fallback = fallback
+
+    def count(self):
+        return Post.objects.filter(
+            author__following__user_id=self.user_id
+        ).count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        recent = recent_posts(followed_authors(self.user_id))
+        pks = merge(recent.values(), index.start or 0, index.stop)
+        if pks is None:
+            return list(self.fallback[index])
+        posts = cached_posts.get_many(pks)
+        return [posts[pk] for pk in pks if pk in posts]
@@ -1,6 +1,8 @@
 from django import forms
+from django.conf import settings
 
-from .models import Post, Comment
+from . import images
+from .models import Comment, ImageJob, Post
 
 
 class PostForm(forms.ModelForm):
@@ -11,6 +13,26 @@ class PostForm(forms.ModelForm):
             'image': 'Image'
         }
 
+    def save(self, commit=True):
+        """Renders the variants of a new image once the file is stored.
+
+        With IMAGE_PROCESSING_ASYNC the image is queued for the
+        ``process_images`` workers instead.
+        """
+
+        post = super().save(commit)
+        if not commit or 'image' not in self.changed_data:
+            return post
+        variants = images.NO_VARIANTS
+        if post.image and settings.IMAGE_PROCESSING_ASYNC:
+            ImageJob.objects.create(post=post)
+        elif post.image:
+            variants = images.render_variants(post.image.name)
+        for field, value in variants.items():
+            setattr(post, field, value)
+        post.save(update_fields=list(variants))
+        return post
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
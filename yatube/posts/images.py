@@ -0,0 +1,111 @@
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+# The card image size used by includes/post.html and post_detail.html.
+THUMBNAIL_SIZE = (960, 339)
+# Card widths offered to browsers through srcset, THUMBNAIL_SIZE included.
+VARIANT_WIDTHS = (480, 960, 1440)
+# Rendered card width for the srcset ``sizes`` attribute.
+SIZES = '(max-width: 992px) 100vw, 960px'
+# Originals are scaled down to fit this box.
+ORIGINAL_MAX_SIZE = (1920, 1920)
+THUMBNAIL_DIR = 'posts/thumbnails/'
+JPEG_QUALITY = 85
+WEBP_QUALITY = 80
+# Pillow may be built without libwebp, then only JPEG variants are made.
+WEBP_SUPPORTED = features.check('webp')
+# Variant fields of a post without an image.
+NO_VARIANTS = {'thumbnail': '', 'srcset_jpeg': '', 'srcset_webp': ''}
+
+
+def variant_name(name, size, extension='jpg'):
+    stem = os.path.splitext(os.path.basename(name))[0]
+    width, height = size
+    return f'{THUMBNAIL_DIR}{stem}_{width}x{height}.{extension}'
+
+
+def store(name, image, **save_options):
+    """Saves a Pillow image under ``name``, replacing an older file."""
+
+    buffer = BytesIO()
+    image.save(buffer, **save_options)
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def normalize(name, image):
+    """Rewrites the original upright, without EXIF, within the size cap.
+
+    Animated images are left alone, re-encoding would drop the frames.
+    So are originals already within the cap and without EXIF: every
+    render would otherwise compress them once more and lose quality.
+    """
+
+    if getattr(image, 'is_animated', False):
+        return image
+    width, height = image.size
+    max_width, max_height = ORIGINAL_MAX_SIZE
+    if width <= max_width and height <= max_height and not image.getexif():
+        return image
+    upright = ImageOps.exif_transpose(image)
+    upright.thumbnail(ORIGINAL_MAX_SIZE, Image.LANCZOS)
+    options = {'format': image.format}
+    if image.format == 'JPEG':
+        options.update(quality=JPEG_QUALITY, optimize=True)
+    store(name, upright, **options)
+    return upright
+
+
+def card_size(width):
+    base_width, base_height = THUMBNAIL_SIZE
+    return width, round(base_height * width / base_width)
+
+
+def srcset(urls):
+    return ', '.join(f'{url} {width}w' for width, url in urls)
+
+
+def render_variants(name):
+    """Normalizes the stored image ``name`` and renders its variants.
+
+    Every width of VARIANT_WIDTHS is cropped to the card proportions
+    and encoded as JPEG and, where supported, WebP. Returns the Post
+    field values pointing at them. Only files are touched, no database,
+    so it is safe to call from worker processes.
+    """
+
+    with default_storage.open(name) as source:
+        image = Image.open(BytesIO(source.read()))
+    image = normalize(name, image).convert('RGB')
+    jpeg, webp = [], []
+    for width in VARIANT_WIDTHS:
+        size = card_size(width)
+        card = ImageOps.fit(image, size, Image.LANCZOS)
+        stored = store(
+            variant_name(name, size),
+            card,
+            format='JPEG',
+            quality=JPEG_QUALITY,
+            optimize=True,
+            progressive=True,
+        )
+        jpeg.append((width, default_storage.url(stored)))
+        if WEBP_SUPPORTED:
+            stored = store(
+                variant_name(name, size, 'webp'),
+                card,
+                format='WEBP',
+                quality=WEBP_QUALITY,
+                method=6,
+            )
+            webp.append((width, default_storage.url(stored)))
+    return {
+        'thumbnail': dict(jpeg)[THUMBNAIL_SIZE[0]],
+        'srcset_jpeg': srcset(jpeg),
+        'srcset_webp': srcset(webp),
+    }
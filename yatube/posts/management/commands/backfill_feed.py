@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import feed
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the materialized subscription feed from Follow and Post.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = feed.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'{total} feed entries written.'))
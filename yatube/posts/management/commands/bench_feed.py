@@ -0,0 +1,167 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from posts.feed_merge import MergedFeed
+from posts.models import FeedEntry, Follow, Post, User
+from posts.sitedata import explicit_dates
+from posts.utils import batched
+
+
+class Command(BaseCommand):
+    help = (
+        'Builds a page of the subscription feed of readers following '
+        '10, 100 and 10,000 authors with the Follow/Post join, the feed '
+        'table and the k-way merge of cached per-author lists, and reports '
+        'the latency and queries of each. The synthetic authors and posts '
+        'are rolled back at the end.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--follows', type=int, nargs='+', default=[10, 100, 10_000],
+            help='Authors followed by each reader.',
+        )
+        parser.add_argument(
+            '--posts', type=int, default=20, help='Posts per author.'
+        )
+        parser.add_argument(
+            '--pages', type=int, nargs='+', default=[1, 5],
+            help='Feed pages to build.',
+        )
+        parser.add_argument('--rounds', type=int, default=20)
+        parser.add_argument('--batch-size', type=int, default=5_000)
+        parser.add_argument(
+            '--seed', type=int, default=None, help='Random seed.'
+        )
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        self.batch_size = options['batch_size']
+        try:
+            with transaction.atomic():
+                readers = self.create_rows(
+                    options['follows'], options['posts']
+                )
+                self.stdout.write(
+                    f'{"follows":>7} {"page":>4} {"engine":<11} '
+                    f'{"p50 ms":>8} {"p99 ms":>8} {"queries":>8}'
+                )
+                for follows, reader in zip(options['follows'], readers):
+                    for page in options['pages']:
+                        self.compare(follows, reader, page, options['rounds'])
+                transaction.set_rollback(True)
+        finally:
+            # Cached lists and posts describe the rolled back rows.
+            cache.clear()
+
+    def bulk_create(self, model, objects):
+        for batch in batched(objects, self.batch_size):
+            model.objects.bulk_create(batch)
+
+    def new_pks(self, model, objects):
+        """Primary keys of the created rows, SQLite doesn't return them
+        from bulk_create."""
+
+        last = model.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+        self.bulk_create(model, objects)
+        return list(model.objects.filter(pk__gt=last).order_by(
+            'pk'
+        ).values_list('pk', flat=True))
+
+    def create_rows(self, follows, per_author):
+        """Authors with ``per_author`` posts over the last year and one
+        reader per entry of ``follows``; returns the readers."""
+
+        started = time.perf_counter()
+        authors = self.new_pks(User, (
+            User(username=f'bench-feed-author-{number}', password='!')
+            for number in range(max(follows))
+        ))
+        readers = self.new_pks(User, (
+            User(username=f'bench-feed-reader-{number}', password='!')
+            for number in range(len(follows))
+        ))
+        now = timezone.now()
+        with explicit_dates(Post._meta.get_field('pub_date')):
+            self.bulk_create(Post, (
+                Post(
+                    author_id=author_id,
+                    text='Benchmark',
+                    pub_date=now - timedelta(days=random.uniform(0, 365)),
+                )
+                for author_id in authors for _ in range(per_author)
+            ))
+        self.bulk_create(Follow, (
+            Follow(user_id=reader, author_id=author_id)
+            for reader, count in zip(readers, follows)
+            for author_id in authors[:count]
+        ))
+        for reader, count in zip(readers, follows):
+            posts = Post.objects.filter(
+                author_id__in=authors[:count]
+            ).values_list('pk', 'author_id', 'pub_date')
+            self.bulk_create(FeedEntry, (
+                FeedEntry(
+                    user_id=reader,
+                    post_id=pk,
+                    author_id=author_id,
+                    pub_date=pub_date,
+                )
+                for pk, author_id, pub_date in posts.iterator()
+            ))
+        self.stdout.write(
+            f'{len(authors) * per_author} posts of {len(authors)} authors '
+            f'in {time.perf_counter() - started:.1f}s, '
+            f'{settings.FEED_RECENT_POSTS} recent posts cached per author'
+        )
+        return readers
+
+    def compare(self, follows, reader, page, rounds):
+        size = settings.POSTS_TO_DISPLAY
+        start, stop = (page - 1) * size, page * size
+        table = Post.objects.select_related('author', 'group').filter(
+            feed_entries__user=reader
+        ).order_by('-feed_entries__pub_date')
+        engines = {
+            'join': lambda: list(
+                Post.objects.select_related('author', 'group').filter(
+                    author__following__user=reader
+                ).order_by('-pub_date')[start:stop]
+            ),
+            'table': lambda: list(table[start:stop]),
+            'merge cold': lambda: MergedFeed(reader, table)[start:stop],
+            'merge warm': lambda: MergedFeed(reader, table)[start:stop],
+        }
+        expected = None
+        for engine, build in engines.items():
+            timings, queries = [], []
+            for _ in range(rounds):
+                if engine == 'merge cold':
+                    cache.clear()
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    posts = build()
+                    timings.append((time.perf_counter() - started) * 1000)
+                queries.append(len(captured))
+            pks = [post.pk for post in posts]
+            if expected is None:
+                expected = pks
+            elif pks != expected:
+                raise CommandError(f'{engine} built another page: {pks}')
+            percentiles = statistics.quantiles(timings, n=100)
+            self.stdout.write(
+                f'{follows:>7} {page:>4} {engine:<11} '
+                f'{percentiles[49]:>8.2f} {percentiles[98]:>8.2f} '
+                f'{statistics.mean(queries):>8.1f}'
+            )
@@ -0,0 +1,46 @@
+from timeit import repeat
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.template.loader import get_template
+
+from posts.utils import CachedCountPaginator
+
+
+class Command(BaseCommand):
+    help = (
+        'Times paginator.html rendering in the middle of lists of growing '
+        'length; with the elided page window the time should stay flat.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts',
+            type=int,
+            nargs='+',
+            default=[1_000, 10_000, 100_000, 1_000_000],
+            help='List lengths to render the paginator for.',
+        )
+        parser.add_argument(
+            '--runs', type=int, default=200, help='Renders per measurement.'
+        )
+
+    def handle(self, *args, **options):
+        template = get_template('posts/includes/paginator.html')
+        self.stdout.write(f'{"posts":>10} {"pages":>8} {"ms/render":>10} '
+                          f'{"bytes":>7}')
+        for posts in options['posts']:
+            paginator = CachedCountPaginator(
+                range(posts), settings.POSTS_TO_DISPLAY
+            )
+            page = paginator.page(paginator.num_pages // 2 or 1)
+            html = template.render({'page_obj': page})
+            best = min(repeat(
+                lambda: template.render({'page_obj': page}),
+                number=options['runs'],
+                repeat=3,
+            ))
+            self.stdout.write(
+                f'{posts:>10} {paginator.num_pages:>8} '
+                f'{best / options["runs"] * 1000:>10.3f} {len(html):>7}'
+            )
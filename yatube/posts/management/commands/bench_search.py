@@ -0,0 +1,134 @@
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.core.paginator import Paginator
+from django.db import connection, transaction
+from django.test import Client
+from django.urls import reverse
+from faker import Faker
+
+from posts import search
+from posts.models import Post, User
+from posts.utils import batched
+
+
+class Command(BaseCommand):
+    help = (
+        'Times posts.search.search() and the search page against a LIKE '
+        'scan on the current database, FTS5 on SQLite or the tsvector '
+        'index on PostgreSQL, with growing numbers of synthetic posts. '
+        'The posts are rolled back at the end.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts',
+            type=int,
+            nargs='+',
+            default=[10_000, 100_000, 1_000_000],
+            help='Synthetic posts to search, in growing order.',
+        )
+        parser.add_argument(
+            '--queries', type=int, default=50, help='Queries per size.'
+        )
+        parser.add_argument(
+            '--words', type=int, default=30, help='Words per post.'
+        )
+        parser.add_argument('--batch-size', type=int, default=5_000)
+
+    def handle(self, *args, **options):
+        random.seed(0)
+        vocabulary = Faker('en_US').words(5000)
+        # Word frequencies of real texts follow Zipf's law.
+        weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+        queries = [
+            ' '.join(random.choices(vocabulary, weights, k=2))
+            for _ in range(options['queries'])
+        ]
+        # Any address outside INTERNAL_IPS keeps the debug toolbar away.
+        client = Client(REMOTE_ADDR='10.0.0.1')
+        url = reverse('posts:search')
+        self.stdout.write(
+            f'{connection.vendor} '
+            f'{"posts":>10} {"search p50":>10} {"search p95":>10} '
+            f'{"view p50":>9} {"view p95":>9} '
+            f'{"like p50":>9} {"like p95":>9} {"hits":>8}'
+        )
+        try:
+            with transaction.atomic():
+                author = User.objects.create_user(username='bench-search')
+                created = 0
+                for posts in options['posts']:
+                    self.create_posts(
+                        author, posts - created, vocabulary, weights,
+                        options['words'], options['batch_size'],
+                    )
+                    created = max(created, posts)
+                    found, hits = self.measure(queries, lambda query: page(
+                        search.search(query).select_related('author', 'group')
+                    ))
+                    view, _ = self.measure(queries, lambda query: self.get(
+                        client, url, query
+                    ))
+                    like, _ = self.measure(queries, lambda query: page(
+                        Post.objects.select_related('author', 'group').filter(
+                            text__icontains=query
+                        ).order_by('-pub_date')
+                    ))
+                    self.stdout.write(
+                        f'{connection.vendor} {posts:>10} '
+                        f'{found[0]:>10.2f} {found[1]:>10.2f} '
+                        f'{view[0]:>9.2f} {view[1]:>9.2f} '
+                        f'{like[0]:>9.2f} {like[1]:>9.2f} {hits:>8}'
+                    )
+                transaction.set_rollback(True)
+        finally:
+            # Cached counts and pages describe the rolled back rows.
+            cache.clear()
+
+    def create_posts(self, author, count, vocabulary, weights, words, size):
+        """Adds ``count`` posts; bulk_create sends no signals, so the
+        SQLite index is rebuilt, PostgreSQL keeps its own up to date."""
+
+        if count <= 0:
+            return
+        for batch in batched((
+            Post(
+                author=author,
+                text=' '.join(random.choices(vocabulary, weights, k=words)),
+            )
+            for _ in range(count)
+        ), size):
+            Post.objects.bulk_create(batch)
+        search.rebuild()
+
+    def get(self, client, url, query):
+        response = client.get(url, {'q': query})
+        if response.status_code != 200:
+            raise CommandError(f'{url} answered {response.status_code}')
+        return 0
+
+    def measure(self, queries, run):
+        """(p50, p95) in ms of ``run`` over the queries and the median
+        of the hits it returns."""
+
+        timings, hits = [], []
+        for query in queries:
+            started = time.perf_counter()
+            hits.append(run(query))
+            timings.append((time.perf_counter() - started) * 1000)
+        percentiles = statistics.quantiles(timings, n=20)
+        return (percentiles[9], percentiles[18]), int(statistics.median(hits))
+
+
+def page(queryset):
+    """Number of hits, after counting and reading the first page the way
+    the search page does."""
+
+    paginator = Paginator(queryset, settings.POSTS_TO_DISPLAY)
+    list(paginator.page(1))
+    return paginator.count
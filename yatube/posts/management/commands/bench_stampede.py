@@ -0,0 +1,85 @@
+import multiprocessing
+import statistics
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from posts import cache
+from posts.models import Post
+
+
+def run_worker(barrier, results, rounds, protect, leader):
+    """Requests the main page together with the other workers right
+    after every invalidation, puts (X-Cache values, timings) into
+    ``results``."""
+
+    client = Client(REMOTE_ADDR='10.0.0.1')
+    url = reverse('posts:index')
+    outcomes, timings = Counter(), []
+    with override_settings(CACHE_STALE_WHILE_REVALIDATE=protect):
+        client.get(url)
+        for _ in range(rounds):
+            if leader:
+                # What a new post does to the main page.
+                cache.bump('index')
+            barrier.wait()
+            started = time.perf_counter()
+            response = client.get(url)
+            timings.append(time.perf_counter() - started)
+            outcomes[response['X-Cache']] += 1
+            barrier.wait()
+    results.put((outcomes, timings))
+
+
+class Command(BaseCommand):
+    help = (
+        'Invalidates the cached main page again and again while several '
+        'worker processes request it at the same moment, with and without '
+        'stale-while-revalidate, and reports the renders per invalidation '
+        'and the latency. Needs the shared cache backend and some posts.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--rounds', type=int, default=50)
+
+    def handle(self, *args, **options):
+        if not Post.objects.exists():
+            raise CommandError('No posts, run the seed command first.')
+        # Every worker opens its own database connection after the fork.
+        connections.close_all()
+        self.stdout.write(
+            f'{"mode":<10} {"renders per bump":>16} {"stale":>6} '
+            f'{"p50 ms":>8} {"p99 ms":>8}'
+        )
+        for protect in (False, True):
+            self.run(protect, options['workers'], options['rounds'])
+
+    def run(self, protect, workers, rounds):
+        context = multiprocessing.get_context('fork')
+        barrier, queue = context.Barrier(workers), context.SimpleQueue()
+        processes = [
+            context.Process(
+                target=run_worker,
+                args=(barrier, queue, rounds, protect, number == 0),
+            )
+            for number in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        results = [queue.get() for _ in processes]
+        for process in processes:
+            process.join()
+        outcomes = sum((result[0] for result in results), Counter())
+        timings = [timing for result in results for timing in result[1]]
+        percentiles = statistics.quantiles(timings, n=100)
+        self.stdout.write(
+            f'{"swr" if protect else "plain":<10} '
+            f'{outcomes["MISS"] / rounds:>16.2f} '
+            f'{outcomes["STALE"] / len(timings):>6.1%} '
+            f'{percentiles[49] * 1000:>8.2f} {percentiles[98] * 1000:>8.2f}'
+        )
@@ -0,0 +1,96 @@
+import random
+import statistics
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+
+VIEWS = ('index', 'group_list', 'profile', 'post_detail', 'follow_index')
+
+
+class Command(BaseCommand):
+    help = (
+        'Requests the list and post pages in process against the current '
+        'database and reports p50/p95/p99 latency and queries per request. '
+        'Fill the database with the seed command first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=200, help='Requests per view.'
+        )
+        parser.add_argument(
+            '--warm',
+            action='store_true',
+            help='Keep the page cache between requests.',
+        )
+        parser.add_argument(
+            '--deep',
+            action='store_true',
+            help='Ask for random pages of the lists, not only the first.',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.count()
+        if not posts:
+            raise CommandError('No posts, run the seed command first.')
+        # Any address outside INTERNAL_IPS keeps the debug toolbar away.
+        self.client = Client(REMOTE_ADDR='10.0.0.1')
+        reader = User.objects.order_by('-stats__following_count').first()
+        self.client.force_login(reader)
+        self.deep = options['deep']
+        self.targets = {
+            'slugs': list(Group.objects.values_list('slug', flat=True)),
+            'usernames': list(User.objects.filter(
+                stats__posts_count__gt=0
+            ).values_list('username', flat=True)),
+            'posts': list(Post.objects.values_list('pk', flat=True)),
+        }
+        self.stdout.write(
+            f'{posts} posts, {"warm" if options["warm"] else "cold"} cache, '
+            f'feed of {reader.username}'
+        )
+        self.stdout.write(
+            f'{"view":<13} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} '
+            f'{"queries":>8}'
+        )
+        for view in VIEWS:
+            timings, queries = [], []
+            for _ in range(options['requests']):
+                if not options['warm']:
+                    cache.clear()
+                url, data = self.request(view)
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = self.client.get(url, data)
+                    timings.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    raise CommandError(
+                        f'{url} answered {response.status_code}'
+                    )
+                queries.append(len(captured))
+            percentiles = statistics.quantiles(timings, n=100)
+            self.stdout.write(
+                f'{view:<13} {percentiles[49]:>8.2f} {percentiles[94]:>8.2f} '
+                f'{percentiles[98]:>8.2f} {statistics.mean(queries):>8.1f}'
+            )
+
+    def request(self, view):
+        """A URL of ``view`` with random arguments and its GET data."""
+
+        data = {'page': random.randint(1, 50)} if self.deep else {}
+        if view == 'group_list':
+            args = (random.choice(self.targets['slugs']),)
+        elif view == 'profile':
+            args = (random.choice(self.targets['usernames']),)
+        elif view == 'post_detail':
+            args, data = (random.choice(self.targets['posts']),), {}
+        else:
+            args = ()
+        return reverse(f'posts:{view}', args=args), data
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from posts import cache
+
+PAGES = (
+    'index', 'group_list', 'profile', 'post_detail', 'post_comments',
+    'search',
+)
+
+
+class Command(BaseCommand):
+    help = 'Shows hit and miss counters of the cached pages.'
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{"page":<14} {"hits":>8} {"misses":>8} {"ratio":>6}'
+        )
+        for name, (hits, misses) in cache.stats(*PAGES).items():
+            ratio = hits / (hits + misses) if hits + misses else 0
+            self.stdout.write(
+                f'{name:<14} {hits:>8} {misses:>8} {ratio:>6.1%}'
+            )
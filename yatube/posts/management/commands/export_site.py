@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from posts import sitedata
+
+
+class Command(BaseCommand):
+    help = (
+        'Streams the users, groups, posts, comments and subscriptions into '
+        'a tar archive of line-delimited JSON together with the post '
+        'images; a .gz suffix compresses it.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archive', help='Path of the archive to write.')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2_000,
+            help='Rows fetched from the database at a time.',
+        )
+
+    def handle(self, *args, **options):
+        sitedata.export_site(
+            options['archive'], self.stdout.write, options['chunk_size']
+        )
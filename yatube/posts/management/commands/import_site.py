@@ -0,0 +1,30 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from posts import sitedata
+
+
+class Command(BaseCommand):
+    help = (
+        'Loads an archive written by export_site into a database without '
+        'those rows, then rebuilds the feed, counters and search index.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archive', help='Path of the archive to read.')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2_000,
+            help='Rows per INSERT.',
+        )
+
+    def handle(self, *args, **options):
+        sitedata.import_site(
+            options['archive'], self.stdout.write, options['batch_size']
+        )
+        # Cached pages and list totals describe the old data.
+        cache.clear()
+        self.stdout.write(self.style.SUCCESS(
+            'Imported, run process_images to render the image variants.'
+        ))
@@ -0,0 +1,148 @@
+import os
+import time
+from collections import defaultdict
+from multiprocessing import Pool
+
+import django
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts import cache
+from posts.images import NO_VARIANTS, render_variants
+from posts.models import ImageJob, Post
+from posts.objects import cached_posts
+
+
+def render(task):
+    """Pool worker: renders one post image, never touches the database."""
+
+    post_id, name = task
+    if not name:
+        return post_id, NO_VARIANTS, ''
+    try:
+        return post_id, render_variants(name), ''
+    except Exception as error:
+        return post_id, None, repr(error)
+
+
+class Command(BaseCommand):
+    help = (
+        'Renders thumbnails and responsive variants of queued post images '
+        'in a pool of worker processes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Queue every post image of the media library first.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help='Worker processes, 0 renders in this process.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Results written to the database at once.',
+        )
+        parser.add_argument(
+            '--watch',
+            type=float,
+            default=0,
+            help='Keep polling the queue every WATCH seconds.',
+        )
+
+    def handle(self, *args, **options):
+        if options['all']:
+            queued = ImageJob.objects.bulk_create(
+                ImageJob(post_id=pk) for pk in Post.objects.exclude(
+                    image=''
+                ).values_list('pk', flat=True).iterator()
+            )
+            self.stdout.write(f'{len(queued)} images queued.')
+        while True:
+            processed = self.drain(options['workers'], options['batch_size'])
+            if not options['watch']:
+                break
+            if not processed:
+                time.sleep(options['watch'])
+
+    def drain(self, workers, batch_size):
+        jobs = defaultdict(list)
+        tasks = {}
+        for job_id, post_id, name in ImageJob.objects.filter(
+            status=ImageJob.QUEUED
+        ).values_list('pk', 'post_id', 'post__image'):
+            jobs[post_id].append(job_id)
+            tasks[post_id] = name
+        if not tasks:
+            return 0
+        total = len(tasks)
+        started = time.perf_counter()
+        results = []
+        if workers:
+            pool = Pool(workers, initializer=django.setup)
+            rendered = pool.imap_unordered(render, tasks.items(), chunksize=4)
+        else:
+            pool = None
+            rendered = map(render, tasks.items())
+        try:
+            for done, result in enumerate(rendered, 1):
+                results.append(result)
+                if len(results) >= batch_size or done == total:
+                    self.save(results, jobs)
+                    results = []
+                    self.report(done, total, started, workers)
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} images in {elapsed:.1f}s, '
+            f'{total / elapsed / max(workers, 1):.2f} images/sec per core.'
+        ))
+        return total
+
+    def save(self, results, jobs):
+        posts = [
+            Post(pk=post_id, **variants)
+            for post_id, variants, error in results if variants is not None
+        ]
+        if posts:
+            Post.objects.bulk_update(posts, list(NO_VARIANTS))
+            self.forget([post.pk for post in posts])
+        ImageJob.objects.filter(pk__in=[
+            job_id for post in posts for job_id in jobs[post.pk]
+        ]).update(status=ImageJob.DONE, processed=timezone.now())
+        for post_id, variants, error in results:
+            if variants is None:
+                self.stderr.write(f'Post {post_id}: {error}')
+                ImageJob.objects.filter(pk__in=jobs[post_id]).update(
+                    status=ImageJob.FAILED,
+                    processed=timezone.now(),
+                    error=error,
+                )
+
+    def forget(self, pks):
+        """Drops the cached pages and objects of the updated posts, like
+        the signals do for a saved post; bulk_update sends none."""
+
+        posts = Post.objects.select_related('author', 'group').only(
+            'author__username', 'group__slug'
+        ).filter(pk__in=pks)
+        cache.bump(*{
+            scope for post in posts for scope in cache.post_page_scopes(post)
+        })
+        cached_posts.forget(*pks)
+
+    def report(self, done, total, started, workers):
+        rate = done / (time.perf_counter() - started)
+        self.stdout.write(
+            f'{done}/{total} images, {rate:.1f}/s, '
+            f'{rate / max(workers, 1):.2f}/s per core'
+        )
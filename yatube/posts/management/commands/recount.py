@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import cache, counters
+
+
+class Command(BaseCommand):
+    help = 'Recomputes denormalized post, comment and subscription counters.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            users, posts = counters.recount()
+        # Cached pages and objects show the counters.
+        cache.bump(cache.SITE)
+        self.stdout.write(self.style.SUCCESS(
+            f'Counters recomputed for {users} users and {posts} posts.'
+        ))
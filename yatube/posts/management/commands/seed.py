@@ -0,0 +1,195 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from faker import Faker
+
+from posts.models import Comment, Follow, Group, Post, User
+from posts.sitedata import explicit_dates, rebuild_derived
+from posts.utils import batched
+
+
+def power_law(count, alpha):
+    """Weights of ``count`` items ranked by Zipf's law in random order."""
+
+    weights = [rank ** -alpha for rank in range(1, count + 1)]
+    random.shuffle(weights)
+    return weights
+
+
+def timestamps(count, days):
+    """``count`` ascending moments spread over the last ``days`` days."""
+
+    now = timezone.now()
+    span = timedelta(days=days).total_seconds()
+    return [
+        now - timedelta(seconds=offset)
+        for offset in sorted(
+            (random.uniform(0, span) for _ in range(count)), reverse=True
+        )
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Fills the database with synthetic users, groups, posts, comments '
+        'and subscriptions; follower counts follow a power law.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1_000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10_000)
+        parser.add_argument('--comments', type=int, default=20_000)
+        parser.add_argument('--follows', type=int, default=20_000)
+        parser.add_argument(
+            '--alpha',
+            type=float,
+            default=1.1,
+            help='Power-law exponent of posts and followers per author.',
+        )
+        parser.add_argument(
+            '--days', type=int, default=365, help='Time span of the posts.'
+        )
+        parser.add_argument(
+            '--password',
+            default='yatube-seed',
+            help='Password of every generated user.',
+        )
+        parser.add_argument('--batch-size', type=int, default=5_000)
+        parser.add_argument(
+            '--seed', type=int, default=None, help='Random seed.'
+        )
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        Faker.seed(options['seed'])
+        self.faker = Faker('en_US')
+        self.batch_size = options['batch_size']
+        # A pool of sentences keeps text generation out of the timings.
+        self.sentences = [self.faker.sentence() for _ in range(5_000)]
+        with transaction.atomic():
+            users = self.create_users(options['users'], options['password'])
+            groups = self.create_groups(options['groups'])
+            posts = self.create_posts(
+                options['posts'],
+                users,
+                power_law(len(users), options['alpha']),
+                groups,
+                options['days'],
+            )
+            self.create_comments(options['comments'], users, posts)
+            self.create_follows(
+                options['follows'],
+                users,
+                power_law(len(users), options['alpha']),
+            )
+            self.timed('derived rows', rebuild_derived)
+        # Cached pages and list totals describe the old data.
+        cache.clear()
+
+    def timed(self, name, create):
+        started = time.perf_counter()
+        total = create()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'{name}: {total} in {elapsed:.1f}s, '
+            f'{total / max(elapsed, 1e-9):.0f} rows/sec'
+        )
+
+    def bulk_create(self, model, objects):
+        total = 0
+        for batch in batched(objects, self.batch_size):
+            model.objects.bulk_create(batch)
+            total += len(batch)
+        return total
+
+    def new_pks(self, model, create):
+        """Primary keys of the rows ``create`` adds, SQLite doesn't return
+        them from bulk_create."""
+
+        last = model.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+        self.timed(model._meta.verbose_name_plural.lower(), create)
+        return list(model.objects.filter(pk__gt=last).values_list(
+            'pk', flat=True
+        ))
+
+    def text(self, low, high):
+        return ' '.join(random.choices(self.sentences, k=random.randint(
+            low, high
+        )))
+
+    def create_users(self, count, password):
+        password = make_password(password)
+        offset = User.objects.count()
+        return self.new_pks(User, lambda: self.bulk_create(User, (
+            User(
+                username=f'{self.faker.user_name()}{offset + number}',
+                first_name=self.faker.first_name(),
+                last_name=self.faker.last_name(),
+                password=password,
+            )
+            for number in range(count)
+        )))
+
+    def create_groups(self, count):
+        offset = Group.objects.count()
+        return self.new_pks(Group, lambda: self.bulk_create(Group, (
+            Group(
+                title=self.faker.catch_phrase()[:200],
+                slug=f'{self.faker.slug()}-{offset + number}',
+                description=self.text(1, 3),
+            )
+            for number in range(count)
+        )))
+
+    def create_posts(self, count, users, weights, groups, days):
+        authors = random.choices(users, weights, k=count)
+        with explicit_dates(Post._meta.get_field('pub_date')):
+            return self.new_pks(Post, lambda: self.bulk_create(Post, (
+                Post(
+                    author_id=author_id,
+                    group_id=(
+                        random.choice(groups)
+                        if groups and random.random() < 0.7 else None
+                    ),
+                    text=self.text(1, 6),
+                    pub_date=pub_date,
+                )
+                for author_id, pub_date in zip(
+                    authors, timestamps(count, days)
+                )
+            )))
+
+    def create_comments(self, count, users, posts):
+        if not posts:
+            return
+        with explicit_dates(Comment._meta.get_field('created')):
+            self.timed('comments', lambda: self.bulk_create(Comment, (
+                Comment(
+                    post_id=random.choice(posts),
+                    author_id=random.choice(users),
+                    text=self.text(1, 2),
+                    created=created,
+                )
+                for created in timestamps(count, 30)
+            )))
+
+    def create_follows(self, count, users, weights):
+        existing = set(Follow.objects.values_list('user_id', 'author_id'))
+        edges = set(zip(
+            random.choices(users, k=count),
+            random.choices(users, weights, k=count),
+        ))
+        self.timed('subscriptions', lambda: self.bulk_create(Follow, (
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id, author_id in edges - existing
+            if user_id != author_id
+        )))
@@ -0,0 +1,42 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.warmup import SIZES, hot_urls, warm_cache
+
+
+class Command(BaseCommand):
+    help = (
+        'Renders the first index pages, the busiest groups, the most '
+        'followed profiles and the most commented posts into the page '
+        'cache, so the first visitors after a deploy are not served cold.'
+    )
+
+    def add_arguments(self, parser):
+        for kind, size in SIZES.items():
+            parser.add_argument(
+                f'--{kind}', type=int, default=size,
+                help=f'Number of {kind} pages (default {size}).',
+            )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Worker processes rendering the pages.',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        urls = hot_urls(**{kind: options[kind] for kind in SIZES})
+        paths = [path for kind_paths in urls.values() for path in kind_paths]
+        statuses = warm_cache(paths, options['workers'])
+        elapsed = time.perf_counter() - started
+        for path, status in zip(paths, statuses):
+            if status != 200:
+                self.stderr.write(f'{path} answered {status}')
+        self.stdout.write(', '.join(
+            f'{kind}: {len(kind_paths)}' for kind, kind_paths in urls.items()
+        ))
+        self.stdout.write(self.style.SUCCESS(
+            f'Warmed {len(paths)} pages in {elapsed:.2f}s, '
+            f'{len(paths) / max(elapsed, 1e-9):.0f} pages/sec'
+        ))
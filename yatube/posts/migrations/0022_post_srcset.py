@@ -0,0 +1,23 @@
+# Generated by Django 2.2.19 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_imagejob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='srcset_jpeg',
+            field=models.TextField(blank=True, editable=False, verbose_name='JPEG variants srcset'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='srcset_webp',
+            field=models.TextField(blank=True, editable=False, verbose_name='WebP variants srcset'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 2.2.19 on 2026-10-17 10:05
+
+from django.db import migrations
+
+SQLITE_CREATE = (
+    "CREATE VIRTUAL TABLE posts_post_search USING fts5("
+    "text, tokenize = 'porter unicode61 remove_diacritics 2')",
+    "INSERT INTO posts_post_search (rowid, text) "
+    "SELECT id, text FROM posts_post",
+)
+SQLITE_DROP = ("DROP TABLE IF EXISTS posts_post_search",)
+POSTGRESQL_CREATE = (
+    "CREATE INDEX posts_post_text_search ON posts_post "
+    "USING GIN (to_tsvector('english', text))",
+)
+POSTGRESQL_DROP = ("DROP INDEX IF EXISTS posts_post_text_search",)
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, ()):
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0022_post_srcset'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'sqlite': SQLITE_CREATE, 'postgresql': POSTGRESQL_CREATE}),
+            run({'sqlite': SQLITE_DROP, 'postgresql': POSTGRESQL_DROP}),
+        ),
+    ]
@@ -41,6 +41,18 @@ class Post(models.Model):
         verbose_name='Author',
     )
     image = models.ImageField('Image', upload_to='posts/', blank=True)
+    thumbnail = models.CharField(
+        'Thumbnail URL', max_length=255, blank=True, editable=False
+    )
+    srcset_jpeg = models.TextField(
+        'JPEG variants srcset', blank=True, editable=False
+    )
+    srcset_webp = models.TextField(
+        'WebP variants srcset', blank=True, editable=False
+    )
+    comments_count = models.PositiveIntegerField(
+        'Number of comments', default=0, editable=False
+    )
 
     def __str__(self):
         return self.text[: settings.TEXT_LIMIT_FOR_STR]
@@ -49,6 +61,14 @@ class Post(models.Model):
         ordering = ['-pub_date']
         verbose_name = 'Post'
         verbose_name_plural = 'Posts'
+        indexes = [
+            models.Index(
+                fields=['author', 'pub_date'], name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', 'pub_date'], name='post_group_pub_date_idx'
+            ),
+        ]
 
 
 class Comment(models.Model):
@@ -78,6 +98,11 @@ class Comment(models.Model):
         ordering = ['-created']
         verbose_name = 'Comment'
         verbose_name_plural = 'Comments'
+        indexes = [
+            models.Index(
+                fields=['post', 'created'], name='comment_post_created_idx'
+            ),
+        ]
 
 
 class Follow(models.Model):
@@ -105,3 +130,126 @@ class Follow(models.Model):
                 fields=['author', 'user'], name='Unique subscription'
             ),
         ]
+        indexes = [
+            models.Index(
+                fields=['user', 'author'], name='follow_user_author_idx'
+            ),
+        ]
+
+
+class AuthorStats(models.Model):
+    """Denormalized per-user totals, maintained by ``posts.signals``.
+
+    The ``recount`` management command rebuilds them from scratch.
+    """
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='User',
+    )
+    posts_count = models.PositiveIntegerField('Number of posts', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Number of subscribers', default=0
+    )
+    following_count = models.PositiveIntegerField(
+        'Number of subscriptions', default=0
+    )
+
+    def __str__(self):
+        return f'{self.user} stats'
+
+    class Meta:
+        verbose_name = 'Author stats'
+        verbose_name_plural = 'Author stats'
+
+
+class ImageJob(models.Model):
+    """A queued request to render the image variants of a post.
+
+    Filled by ``PostForm`` and drained by the ``process_images`` command.
+    """
+
+    QUEUED = 'queued'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'Queued'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='image_jobs',
+        verbose_name='Post',
+    )
+    status = models.CharField(
+        'Status', max_length=10, choices=STATUSES, default=QUEUED
+    )
+    created = models.DateTimeField('Queued at', auto_now_add=True)
+    processed = models.DateTimeField('Processed at', null=True, blank=True)
+    error = models.TextField('Error', blank=True)
+
+    def __str__(self):
+        return f'{self.post_id} image {self.status}'
+
+    class Meta:
+        ordering = ['created']
+        verbose_name = 'Image job'
+        verbose_name_plural = 'Image jobs'
+        indexes = [
+            models.Index(
+                fields=['status', 'created'], name='imagejob_status_idx'
+            ),
+        ]
+
+
+class FeedEntry(models.Model):
+    """A post materialized into a follower's subscription feed.
+
+    Rows are written when a post is published or a subscription is made
+    (see ``posts.signals``), so the follow feed is a single range scan over
+    the ``(user, pub_date)`` index instead of a Follow/Post join.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed',
+        verbose_name='Subscriber',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Post',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Post author',
+    )
+    pub_date = models.DateTimeField('Publication date')
+
+    def __str__(self):
+        return f'{self.post_id} in {self.user_id} feed'
+
+    class Meta:
+        ordering = ['-pub_date']
+        verbose_name = 'Feed entry'
+        verbose_name_plural = 'Feed entries'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='Unique feed entry'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'pub_date'], name='feed_user_pub_date_idx'
+            ),
+        ]
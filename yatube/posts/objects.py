@@ -0,0 +1,102 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404
+
+from .cache import SITE, versions
+from .models import Group, Post, User
+
+OBJECT_KEY = 'posts:object:{}:{}:{}'
+LOOKUP_KEY = 'posts:object-lookup:{}:{}:{}:{}'
+
+
+class ObjectCache:
+    """Read-through cache of ``model`` rows by primary key and by the
+    unique ``fields``.
+
+    Rows are remembered until a site change or ``forget``, which the
+    signals call on every save and delete. A lookup by another field
+    remembers only the primary key and is checked against the row, so
+    a renamed object is never served under its old name. ``related``
+    rows are cached along, which is safe as any user or group change
+    bumps the site version; ``defer`` keeps password hashes out.
+    """
+
+    def __init__(self, model, *fields, related=(), defer=()):
+        self.model = model
+        self.fields = fields
+        self.related = related
+        self.defer = defer
+        self.label = model._meta.label_lower
+
+    def queryset(self):
+        return self.model._default_manager.select_related(
+            *self.related
+        ).defer(*self.defer)
+
+    def key(self, version, pk):
+        return OBJECT_KEY.format(self.label, version, pk)
+
+    def get_many(self, pks):
+        """{pk: object} of the existing rows, the missing ones fetched
+        in a single query."""
+
+        version, = versions(SITE)
+        keys = {self.key(version, pk): pk for pk in pks}
+        found = {
+            keys[key]: obj for key, obj in cache.get_many(list(keys)).items()
+        }
+        missing = [pk for pk in keys.values() if pk not in found]
+        if missing:
+            loaded = self.queryset().in_bulk(missing)
+            cache.set_many({
+                self.key(version, pk): obj for pk, obj in loaded.items()
+            }, settings.CACHE_TIME_TO_LIVE)
+            found.update(loaded)
+        return found
+
+    def get(self, **lookup):
+        """The object of a single ``pk=`` or unique field lookup; raises
+        DoesNotExist like ``Manager.get``."""
+
+        (field, value), = lookup.items()
+        if field in ('pk', 'id'):
+            obj = self.get_many([value]).get(value)
+            if obj is None:
+                raise self.model.DoesNotExist(
+                    f'{self.model.__name__} {value} does not exist.'
+                )
+            return obj
+        if field not in self.fields:
+            raise ValueError(f'{field} is not a cached lookup.')
+        version, = versions(SITE)
+        key = LOOKUP_KEY.format(self.label, version, field, value)
+        pk = cache.get(key)
+        if pk is not None:
+            obj = self.get_many([pk]).get(pk)
+            if obj is not None and getattr(obj, field) == value:
+                return obj
+        obj = self.queryset().get(**lookup)
+        cache.set_many({
+            key: obj.pk, self.key(version, obj.pk): obj,
+        }, settings.CACHE_TIME_TO_LIVE)
+        return obj
+
+    def forget(self, *pks):
+        version, = versions(SITE)
+        cache.delete_many([self.key(version, pk) for pk in pks])
+
+
+def get_or_404(objects, **lookup):
+    """``get_object_or_404`` served by an ObjectCache."""
+
+    try:
+        return objects.get(**lookup)
+    except objects.model.DoesNotExist:
+        raise Http404(f'No {objects.model.__name__} matches the query.')
+
+
+cached_posts = ObjectCache(
+    Post, related=('author', 'group'), defer=('author__password',)
+)
+cached_groups = ObjectCache(Group, 'slug')
+cached_users = ObjectCache(User, 'username', defer=('password',))
@@ -0,0 +1,94 @@
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Value
+
+from .models import Post
+
+# SQLite keeps a copy of the post texts in this FTS5 table, rowid = post id.
+TABLE = 'posts_post_search'
+# Postgres searches an expression GIN index on the text column instead.
+CONFIG = 'english'
+VECTOR = f"to_tsvector('{CONFIG}', {Post._meta.db_table}.text)"
+TERM_RE = re.compile(r'\w+')
+
+
+def fts5_query(text):
+    """User input as an FTS5 query: every word must occur, no operators."""
+
+    return ' '.join(f'"{term}"' for term in TERM_RE.findall(text))
+
+
+def search(text, queryset=None):
+    """Posts containing every word of ``text``, the best ranked first.
+
+    The posts carry ``search_rank``, higher means more relevant. Backends
+    without full-text support fall back to a substring scan.
+    """
+
+    if queryset is None:
+        queryset = Post.objects.all()
+    if not TERM_RE.search(text):
+        # Nothing to find, but callers may still order by the rank.
+        queryset = queryset.none().annotate(
+            search_rank=Value(0, FloatField())
+        )
+    elif connection.vendor == 'sqlite':
+        queryset = queryset.extra(
+            select={'search_rank': f'-{TABLE}.rank'},
+            tables=[TABLE],
+            where=[
+                f'{TABLE}.rowid = {Post._meta.db_table}.id',
+                f'{TABLE} MATCH %s',
+            ],
+            params=[fts5_query(text)],
+        )
+    elif connection.vendor == 'postgresql':
+        queryset = queryset.extra(
+            select={
+                'search_rank': (
+                    f"ts_rank({VECTOR}, plainto_tsquery('{CONFIG}', %s))"
+                ),
+            },
+            select_params=[text],
+            where=[f"{VECTOR} @@ plainto_tsquery('{CONFIG}', %s)"],
+            params=[text],
+        )
+    else:
+        queryset = queryset.filter(text__icontains=text).annotate(
+            search_rank=Value(0, FloatField())
+        )
+    return queryset.order_by('-search_rank', '-pub_date')
+
+
+def index_post(post):
+    """Stores the current text of ``post`` in the search index."""
+
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT OR REPLACE INTO {TABLE} (rowid, text) VALUES (%s, %s)',
+            [post.pk, post.text],
+        )
+
+
+def unindex_post(post_id):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post_id])
+
+
+def rebuild():
+    """Indexes every post again, returns the number of posts."""
+
+    if connection.vendor != 'sqlite':
+        return Post.objects.count()
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        cursor.execute(
+            f'INSERT INTO {TABLE} (rowid, text) '
+            f'SELECT id, text FROM {Post._meta.db_table}'
+        )
+        return cursor.rowcount
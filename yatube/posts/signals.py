@@ -0,0 +1,212 @@
+import threading
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+
+from . import cache, counters, feed, search
+from .feed_merge import forget_recent
+from .models import AuthorStats, Comment, Follow, Group, Post, User
+from .objects import cached_posts
+from .utils import count_key, forget_counts
+
+
+class DeletingPosts(threading.local):
+    """Posts whose delete runs in this thread: their comments go along,
+    the post's own signal covers the pages and its counter goes with
+    the row."""
+
+    def __init__(self):
+        self.pks = set()
+
+
+deleting = DeletingPosts()
+
+
+def on_commit(func, *args):
+    """Runs ``func`` once the write commits: invalidated earlier, a
+    concurrent request could cache the old rows under the new version."""
+
+    transaction.on_commit(partial(func, *args))
+
+
+class CommitBatch:
+    """The arguments of the calls deferred to one commit, merged per
+    function."""
+
+    def __init__(self):
+        self.calls = {}
+
+    def add(self, func, args):
+        self.calls.setdefault(func, {}).update(dict.fromkeys(args))
+
+    def __call__(self):
+        for func, args in self.calls.items():
+            func(*args)
+
+
+def on_commit_merged(func, *args):
+    """Like ``on_commit``, but the calls of ``func`` in one transaction
+    become a single call with all their arguments, so a write of many
+    rows queues one invalidation, not one per row."""
+
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        func(*args)
+        return
+    savepoints = set(connection.savepoint_ids)
+    for queued_in, callback in reversed(connection.run_on_commit):
+        if isinstance(callback, CommitBatch) and queued_in == savepoints:
+            batch = callback
+            break
+    else:
+        batch = CommitBatch()
+        transaction.on_commit(batch)
+    batch.add(func, args)
+
+
+def forget_post_counts(post, group_ids):
+    """Drops the cached list lengths; the feed lengths are keyed by the
+    feed versions and change with them."""
+
+    on_commit(
+        forget_counts,
+        count_key('index'),
+        count_key('author', post.author_id),
+        *(count_key('group', pk) for pk in group_ids if pk is not None),
+    )
+
+
+def bump_post_pages(post, *group_slugs):
+    """Drops cached pages that show the post, the feeds included: they
+    check the version of the post author on reading."""
+
+    on_commit_merged(
+        cache.bump, *cache.post_page_scopes(post, *group_slugs)
+    )
+
+
+@receiver(pre_save, sender=Post)
+def post_changing(sender, instance, raw, **kwargs):
+    instance._stored_group = (None, None)
+    if instance.pk is not None and not raw:
+        instance._stored_group = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group_id', 'group__slug').first() or (None, None)
+
+
+@receiver(post_save, sender=Post)
+def post_published(sender, instance, created, raw, update_fields, **kwargs):
+    if raw:
+        return
+    if update_fields is None or 'text' in update_fields:
+        search.index_post(instance)
+    on_commit(cached_posts.forget, instance.pk)
+    stored_group_id, stored_group_slug = instance._stored_group
+    bump_post_pages(instance, stored_group_slug)
+    if created:
+        feed.fan_out_post(instance)
+        on_commit(forget_recent, instance.author_id)
+        counters.change_author_stats(instance.author_id, posts_count=1)
+        forget_post_counts(instance, [instance.group_id])
+    elif stored_group_id != instance.group_id:
+        on_commit(
+            forget_counts,
+            count_key('group', stored_group_id),
+            count_key('group', instance.group_id),
+        )
+
+
+def bump_comment_pages(post_id):
+    """Drops the pages of a post whose comments changed, its author and
+    group taken from the object cache rather than loaded again."""
+
+    on_commit_merged(cached_posts.forget, post_id)
+    post = cached_posts.get_many([post_id]).get(post_id)
+    if post is not None:
+        bump_post_pages(post)
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    deleting.pks.add(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    deleting.pks.discard(instance.pk)
+    search.unindex_post(instance.pk)
+    on_commit(cached_posts.forget, instance.pk)
+    on_commit(forget_recent, instance.author_id)
+    bump_post_pages(instance)
+    counters.change_author_stats(instance.author_id, posts_count=-1)
+    forget_post_counts(instance, [instance.group_id])
+
+
+def bump_follow_pages(follow):
+    """Drops both profiles, they show subscription totals, and the
+    subscriber's feed."""
+
+    on_commit(
+        cache.bump,
+        cache.author_scope(follow.user.username),
+        cache.author_scope(follow.author.username),
+    )
+    on_commit(cache.reset, cache.feed_scope(follow.user_id))
+    on_commit(cache.forget_followed, follow.user_id)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        feed.subscribe(instance.user_id, instance.author_id)
+        counters.change_author_stats(instance.user_id, following_count=1)
+        counters.change_author_stats(instance.author_id, followers_count=1)
+        bump_follow_pages(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    feed.unsubscribe(instance.user_id, instance.author_id)
+    counters.change_author_stats(instance.user_id, following_count=-1)
+    counters.change_author_stats(instance.author_id, followers_count=-1)
+    bump_follow_pages(instance)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        counters.change_comments_count(instance.post_id, 1)
+        bump_comment_pages(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if instance.post_id not in deleting.pks:
+        counters.change_comments_count(instance.post_id, -1)
+        bump_comment_pages(instance.post_id)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw, update_fields, **kwargs):
+    if raw:
+        return
+    if created:
+        AuthorStats.objects.create(user=instance)
+    elif update_fields is None or set(update_fields) - {'last_login'}:
+        on_commit(cache.bump, cache.SITE)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    on_commit(cache.bump, cache.SITE)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        on_commit(cache.bump, cache.SITE)
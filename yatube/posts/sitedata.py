@@ -0,0 +1,204 @@
+import json
+import tarfile
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from django.apps import apps
+from django.core.files.base import File
+from django.core.files.storage import default_storage
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from . import counters, feed, search
+from .models import Comment, Follow, Group, ImageJob, Post, User
+
+DATA = 'data.jsonl'
+MEDIA = 'media/'
+# Export order, every model only points at the ones before it.
+MODELS = (User, Group, Post, Comment, Follow)
+# Kept up to date by the site itself, never exported.
+DERIVED = {
+    Post: {'thumbnail', 'srcset_jpeg', 'srcset_webp', 'comments_count'},
+}
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Lets bulk_create keep the given values of auto_now_add fields."""
+
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def rebuild_derived():
+    """Refills the feed, counters and search index, returns the rows."""
+
+    return feed.rebuild() + counters.recount()[0] + search.rebuild()
+
+
+def fields_of(model):
+    return [
+        field for field in model._meta.concrete_fields
+        if field.name not in DERIVED.get(model, ())
+    ]
+
+
+class Encoder(DjangoJSONEncoder):
+    """Keeps the microseconds DjangoJSONEncoder rounds datetimes down to."""
+
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class Progress:
+    """Counts rows per model and reports them in rows per second."""
+
+    def __init__(self, write):
+        self.write = write
+        self.started = time.perf_counter()
+        self.total = 0
+
+    def done(self, name, rows, started):
+        self.total += rows
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        self.write(f'{name}: {rows} rows, {rows / elapsed:.0f} rows/sec')
+
+    def finish(self):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        self.write(
+            f'{self.total} rows in {elapsed:.1f}s, '
+            f'{self.total / elapsed:.0f} rows/sec'
+        )
+
+
+def export_site(path, write, chunk_size=2000):
+    """Writes a tar archive of ``data.jsonl``, one object per line in
+    MODELS order, and the post images under ``media/``."""
+
+    progress = Progress(write)
+    mode = 'w:gz' if path.endswith('gz') else 'w'
+    with tarfile.open(path, mode) as archive, \
+            tempfile.TemporaryFile('w+b') as data:
+        for model in MODELS:
+            started = time.perf_counter()
+            names = [field.attname for field in fields_of(model)]
+            label = model._meta.label_lower
+            rows = 0
+            for values in model.objects.order_by('pk').values_list(
+                *names
+            ).iterator(chunk_size=chunk_size):
+                data.write(json.dumps(
+                    {'model': label, 'fields': dict(zip(names, values))},
+                    cls=Encoder,
+                ).encode())
+                data.write(b'\n')
+                rows += 1
+            progress.done(label, rows, started)
+        info = tarfile.TarInfo(DATA)
+        info.size = data.tell()
+        data.seek(0)
+        archive.addfile(info, data)
+        started = time.perf_counter()
+        images = 0
+        for name in Post.objects.exclude(image='').order_by().values_list(
+            'image', flat=True
+        ).distinct().iterator(chunk_size=chunk_size):
+            if not default_storage.exists(name):
+                continue
+            info = tarfile.TarInfo(MEDIA + name)
+            info.size = default_storage.size(name)
+            with default_storage.open(name) as image:
+                archive.addfile(info, image)
+            images += 1
+        progress.done('media files', images, started)
+    progress.finish()
+
+
+def _parse(model, fields):
+    """Model instance from exported values, dates back to datetimes."""
+
+    for field in model._meta.concrete_fields:
+        value = fields.get(field.attname)
+        if value is not None and field.get_internal_type() == 'DateTimeField':
+            fields[field.attname] = parse_datetime(value)
+    return model(**fields)
+
+
+def _load(lines, progress, batch_size):
+    """Bulk-creates the objects of ``lines``, one model after another."""
+
+    model, batch, rows, started = None, [], 0, time.perf_counter()
+    for line in lines:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        next_model = apps.get_model(record['model'])
+        if next_model not in MODELS:
+            raise ValueError(f'{record["model"]} is not site data.')
+        if next_model is not model or len(batch) >= batch_size:
+            if batch:
+                model.objects.bulk_create(batch)
+                rows += len(batch)
+                batch = []
+            if next_model is not model:
+                if model is not None:
+                    progress.done(model._meta.label_lower, rows, started)
+                model, rows, started = next_model, 0, time.perf_counter()
+        batch.append(_parse(model, record['fields']))
+    if batch:
+        model.objects.bulk_create(batch)
+        progress.done(model._meta.label_lower, rows + len(batch), started)
+
+
+def import_site(path, write, batch_size=2000):
+    """Loads an archive made by export_site into a database without the
+    exported rows.
+
+    Rows are bulk-created without signals, with foreign keys checked once
+    at the end; the feed, counters and search index are then rebuilt and
+    the images queued for processing.
+    """
+
+    progress = Progress(write)
+    dates = [
+        field for model in MODELS for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now_add', False)
+    ]
+    with tarfile.open(path, 'r:*') as archive, transaction.atomic(), \
+            connection.constraint_checks_disabled(), explicit_dates(*dates):
+        for member in archive:
+            if member.name == DATA:
+                _load(archive.extractfile(member), progress, batch_size)
+            elif member.isfile() and member.name.startswith(MEDIA):
+                name = member.name[len(MEDIA):]
+                if not default_storage.exists(name):
+                    default_storage.save(
+                        name, File(archive.extractfile(member))
+                    )
+        connection.check_constraints(
+            table_names=[model._meta.db_table for model in MODELS]
+        )
+        with connection.cursor() as cursor:
+            for statement in connection.ops.sequence_reset_sql(
+                no_style(), MODELS
+            ):
+                cursor.execute(statement)
+        started = time.perf_counter()
+        progress.done('derived rows', rebuild_derived(), started)
+        ImageJob.objects.bulk_create(
+            ImageJob(post_id=pk) for pk in Post.objects.exclude(
+                image=''
+            ).values_list('pk', flat=True).iterator()
+        )
+    progress.finish()
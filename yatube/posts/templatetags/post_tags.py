@@ -0,0 +1,29 @@
+from django import template
+
+from posts.cache import followed_authors
+from posts.forms import CommentForm
+from posts.images import SIZES
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def following(context, author_id):
+    """Whether the current user is subscribed to the author."""
+
+    user = context['user']
+    return user.is_authenticated and int(author_id) in followed_authors(
+        user.pk
+    )
+
+
+@register.simple_tag
+def comment_form():
+    return CommentForm()
+
+
+@register.inclusion_tag('includes/picture.html')
+def srcset(post, sizes=SIZES):
+    """Responsive <picture> of the rendered variants of the post image."""
+
+    return {'post': post, 'sizes': sizes}
@@ -1,17 +1,27 @@
 from http import HTTPStatus
+from io import BytesIO, StringIO
+import os
 import shutil
 import tempfile
 
 from faker import Faker
+from PIL import Image
 from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
 
-from ..models import Post, User, Group, Comment
+from .. import cache as posts_cache, images
+from ..models import Comment, Group, ImageJob, Post, User
+from ..thumbnails import prefetch_thumbnails
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+ORIENTATION = 0x0112
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -37,6 +47,24 @@ class PostFormTests(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
         super().tearDownClass()
 
+    def setUp(self):
+        cache.clear()
+
+    @staticmethod
+    def gif(name):
+        return SimpleUploadedFile(
+            name=name,
+            content=(
+                b'\x47\x49\x46\x38\x39\x61\x02\x00'
+                b'\x01\x00\x80\x00\x00\x00\x00\x00'
+                b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+                b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+                b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+                b'\x0A\x00\x3B'
+            ),
+            content_type='image/gif'
+        )
+
     def test_post_creation_by_an_authorized_user(self):
         """When an authorized user fills a valid form, a post is created."""
 
@@ -78,6 +106,137 @@ class PostFormTests(TestCase):
             reverse('posts:profile', args=(self.user,))
         )
 
+    def test_uploaded_image_is_queued_and_processed(self):
+        """Saving a post with an image queues it, the worker stores
+        the thumbnail URL and the pages link the stored thumbnail."""
+
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'With a picture', 'image': self.gif('queued.gif')},
+        )
+        post = Post.objects.first()
+        job = ImageJob.objects.get(post=post)
+        self.assertEqual(job.status, ImageJob.QUEUED)
+        self.assertEqual(post.thumbnail, '')
+        call_command('process_images', workers=0, stdout=StringIO())
+        post.refresh_from_db()
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImageJob.DONE)
+        self.assertTrue(post.thumbnail.startswith(settings.MEDIA_URL))
+        thumbnail_path = os.path.join(
+            TEMP_MEDIA_ROOT, post.thumbnail[len(settings.MEDIA_URL):]
+        )
+        self.assertTrue(os.path.exists(thumbnail_path))
+        response = self.client.get(
+            reverse('posts:post_detail', args=(post.id,))
+        )
+        self.assertContains(response, f'src="{post.thumbnail}"')
+        self.authorized_client.post(
+            reverse('posts:post_edit', args=(post.id,)),
+            data={'text': 'Without a picture', 'image-clear': 'on'},
+        )
+        post.refresh_from_db()
+        self.assertFalse(post.image)
+        self.assertEqual(post.thumbnail, '')
+
+    @override_settings(IMAGE_PROCESSING_ASYNC=False)
+    def test_image_is_processed_in_request_without_workers(self):
+        """Without the queue the thumbnail is rendered on save."""
+
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'With a picture', 'image': self.gif('inline.gif')},
+        )
+        post = Post.objects.first()
+        self.assertFalse(ImageJob.objects.exists())
+        self.assertTrue(post.thumbnail.startswith(settings.MEDIA_URL))
+
+    @override_settings(IMAGE_PROCESSING_ASYNC=False)
+    def test_original_is_normalized_and_variants_are_rendered(self):
+        """The original loses EXIF and shrinks, every width gets a
+        variant and the pages offer them through srcset."""
+
+        exif = Image.Exif()
+        exif[ORIENTATION] = 6
+        buffer = BytesIO()
+        Image.new('RGB', (3000, 1000)).save(
+            buffer, format='JPEG', exif=exif.tobytes()
+        )
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'Big photo',
+                'image': SimpleUploadedFile('big.jpg', buffer.getvalue()),
+            },
+        )
+        post = Post.objects.first()
+        with Image.open(post.image.path) as original:
+            self.assertEqual(original.size, (640, 1920))
+            self.assertNotIn(ORIENTATION, original.getexif())
+        for width in images.VARIANT_WIDTHS:
+            self.assertIn(f' {width}w', post.srcset_jpeg)
+        self.assertEqual(bool(post.srcset_webp), images.WEBP_SUPPORTED)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, f'srcset="{post.srcset_jpeg}"')
+
+    def test_normalized_original_is_not_encoded_again(self):
+        """Rendering the variants again leaves the original untouched."""
+
+        buffer = BytesIO()
+        Image.new('RGB', (800, 600)).save(buffer, format='JPEG')
+        name = default_storage.save(
+            'posts/small.jpg', ContentFile(buffer.getvalue())
+        )
+        images.render_variants(name)
+        with default_storage.open(name) as original:
+            self.assertEqual(original.read(), buffer.getvalue())
+
+    def test_stored_thumbnails_of_a_page_are_fetched_at_once(self):
+        """Made sorl thumbnails are resolved with one query per page."""
+
+        posts = [
+            Post.objects.create(
+                author=self.user, text=name, image=self.gif(f'{name}.gif')
+            )
+            for name in ('first', 'second')
+        ]
+        response = self.client.get(reverse('posts:index'))
+        cache.clear()
+        with self.assertNumQueries(1):
+            prefetch_thumbnails(posts)
+        with self.assertNumQueries(0):
+            prefetch_thumbnails(posts)
+        for post in posts:
+            self.assertContains(response, post.card_thumbnail.url)
+
+    def test_process_images_reprocesses_the_library_in_a_pool(self):
+        """--all queues every image, broken ones are marked failed; the
+        pages of the posts are invalidated, not the whole site."""
+
+        good = Post.objects.create(
+            author=self.user, text='Good', image=self.gif('good.gif')
+        )
+        broken = Post.objects.create(
+            author=self.user,
+            text='Broken',
+            image=SimpleUploadedFile('broken.gif', b'not an image'),
+        )
+        scopes = (posts_cache.SITE, posts_cache.post_scope(good.pk))
+        site, page = posts_cache.versions(*scopes)
+        stdout = StringIO()
+        call_command(
+            'process_images', all=True, workers=2,
+            stdout=stdout, stderr=StringIO()
+        )
+        self.assertEqual(posts_cache.versions(*scopes)[0], site)
+        self.assertNotEqual(posts_cache.versions(*scopes)[1], page)
+        good.refresh_from_db()
+        self.assertTrue(good.thumbnail)
+        self.assertEqual(
+            ImageJob.objects.get(post=broken).status, ImageJob.FAILED
+        )
+        self.assertIn('images/sec per core', stdout.getvalue())
+
     def test_edit_post_by_an_authorized_user(self):
         """Post author can edit it."""
 
@@ -178,8 +337,9 @@ class PostFormTests(TestCase):
             response,
             post_detail_url
         )
-        response = self.authorized_client.get(post_detail_url)
         self.assertEqual(response.context['comments'][0], last_comment)
+        response = self.authorized_client.get(post_detail_url)
+        self.assertContains(response, text)
 
     def test_comment_by_an_unauthorized_user(self):
         """Anonymous can't leave a comment."""
@@ -1,8 +1,20 @@
+from io import StringIO
+import os
+import shutil
+import tempfile
+
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db.models import Count, F, Sum
+from django.test import TestCase, override_settings
 
-from ..models import Group, Post
+from ..models import (
+    AuthorStats, Comment, FeedEntry, Follow, Group, ImageJob, Post
+)
+from ..search import search
 
 User = get_user_model()
 
@@ -64,3 +76,167 @@ class PostModelTest(TestCase):
             with self.subTest(field=field):
                 self.assertEqual(
                     self.post._meta.get_field(field).help_text, expected_value)
+
+
+class CountersTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def stats(self, user):
+        return AuthorStats.objects.values_list(
+            'posts_count', 'followers_count', 'following_count'
+        ).get(user=user)
+
+    def test_counters_follow_writes(self):
+        """Post, comment and subscription writes keep counters exact."""
+
+        post = Post.objects.create(author=self.author, text='Counted')
+        Comment.objects.create(post=post, author=self.reader, text='One')
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Two'
+        )
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 2)
+        self.assertEqual(self.stats(self.author), (1, 1, 0))
+        self.assertEqual(self.stats(self.reader), (0, 0, 1))
+        comment.delete()
+        follow.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.stats(self.author), (1, 0, 0))
+        self.assertEqual(self.stats(self.reader), (0, 0, 0))
+        post.delete()
+        self.assertEqual(self.stats(self.author), (0, 0, 0))
+
+    def test_recount_repairs_drift(self):
+        """The recount command fixes counters after signal-less writes."""
+
+        Post.objects.bulk_create(
+            [Post(author=self.author, text='Bulk') for _ in range(3)]
+        )
+        post = Post.objects.filter(author=self.author).first()
+        Comment.objects.bulk_create(
+            [Comment(post=post, author=self.reader, text='Bulk')]
+        )
+        Follow.objects.bulk_create(
+            [Follow(user=self.reader, author=self.author)]
+        )
+        AuthorStats.objects.filter(user=self.reader).delete()
+        self.assertEqual(self.stats(self.author), (0, 0, 0))
+        call_command('recount', stdout=StringIO())
+        self.assertEqual(self.stats(self.author), (3, 1, 0))
+        self.assertEqual(self.stats(self.reader), (0, 0, 1))
+        self.assertEqual(
+            Post.objects.get(pk=post.pk).comments_count, 1
+        )
+
+
+class SeedCommandTest(TestCase):
+
+    def test_seed_fills_tables_and_derived_rows(self):
+        """Seeded rows come with their feed, counters and search index."""
+
+        call_command(
+            'seed',
+            users=600,
+            groups=3,
+            posts=700,
+            comments=50,
+            follows=1500,
+            seed=1,
+            stdout=StringIO(),
+        )
+        self.assertEqual(User.objects.count(), 600)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 700)
+        self.assertEqual(Comment.objects.count(), 50)
+        self.assertFalse(Follow.objects.filter(user=F('author')).exists())
+        followed = Follow.objects.values('author').annotate(
+            total=Count('pk')
+        ).order_by('-total').values_list('total', flat=True)
+        # Power law: the most followed author has far more than average.
+        self.assertGreater(followed[0], 5 * Follow.objects.count() / 600)
+        self.assertEqual(AuthorStats.objects.count(), 600)
+        follow = Follow.objects.first()
+        self.assertEqual(
+            FeedEntry.objects.filter(
+                user=follow.user, author=follow.author
+            ).count(),
+            Post.objects.filter(author=follow.author).count(),
+        )
+        self.assertEqual(
+            Post.objects.aggregate(total=Sum('comments_count'))['total'], 50
+        )
+        self.assertTrue(search(Post.objects.first().text.split()[0]))
+
+
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=os.path.join(TEMP_DIR, 'media'))
+class SiteDataCommandsTest(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def test_export_then_import_restores_the_site(self):
+        """An exported site imports back with its rows, dates and images."""
+
+        call_command(
+            'seed',
+            users=30,
+            groups=2,
+            posts=60,
+            comments=40,
+            follows=80,
+            seed=2,
+            stdout=StringIO(),
+        )
+        image = default_storage.save('posts/export.gif', ContentFile(b'GIF'))
+        with_image = Post.objects.first().pk
+        Post.objects.filter(pk=with_image).update(image=image)
+        expected = {
+            model: list(model.objects.order_by('pk').values())
+            for model in (User, Group, Comment, Follow)
+        }
+        posts = list(Post.objects.order_by('pk').values_list(
+            'pk', 'text', 'pub_date', 'author', 'group', 'image',
+            'comments_count',
+        ))
+        feed = FeedEntry.objects.count()
+        archive = os.path.join(TEMP_DIR, 'site.tar.gz')
+        out = StringIO()
+        call_command('export_site', archive, stdout=out)
+        self.assertIn('rows/sec', out.getvalue())
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        default_storage.delete(image)
+
+        call_command('import_site', archive, batch_size=25, stdout=out)
+        for model, rows in expected.items():
+            self.assertEqual(
+                list(model.objects.order_by('pk').values()), rows
+            )
+        self.assertEqual(list(Post.objects.order_by('pk').values_list(
+            'pk', 'text', 'pub_date', 'author', 'group', 'image',
+            'comments_count',
+        )), posts)
+        self.assertEqual(FeedEntry.objects.count(), feed)
+        self.assertEqual(AuthorStats.objects.count(), 30)
+        self.assertTrue(default_storage.exists(image))
+        self.assertEqual(
+            list(ImageJob.objects.values_list('post', flat=True)),
+            [with_image],
+        )
+        self.assertTrue(search(posts[-1][1].split()[0]))
+        # The sequences continue after the imported keys.
+        self.assertGreater(
+            Group.objects.create(slug='new', title='New').pk,
+            max(row['id'] for row in expected[Group]),
+        )
@@ -0,0 +1,76 @@
+from http import HTTPStatus
+import re
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+# A table read row by row, not through an index.
+FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?\w+$')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Reads SQLite query plans')
+class QueryPlanTests(TestCase):
+    """Every query of a list page must be an index range scan.
+
+    The views are requested with the queries captured, then each query
+    is explained; a plan reading a whole table or sorting the rows
+    in a temporary B-tree fails the test.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Planner')
+        cls.reader = User.objects.create_user(username='PlanReader')
+        cls.group = Group.objects.create(
+            title='Plans', slug='plans', description='Query plans'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Explained post'
+        )
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Explained comment'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertIndexedPlans(self, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, data)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        for query in queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT'):
+                continue
+            for step in self.plan(sql):
+                with self.subTest(url=url, data=data, sql=sql, step=step):
+                    self.assertNotRegex(step, FULL_SCAN)
+                    self.assertNotIn(TEMP_SORT, step)
+
+    def test_list_pages_use_indexes(self):
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.author.username,)),
+            reverse('posts:post_detail', args=(self.post.pk,)),
+            reverse('posts:post_comments', args=(self.post.pk,)),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            self.assertIndexedPlans(url)
+            self.assertIndexedPlans(url, {'page': 1})
+            self.assertIndexedPlans(url, {'cursor': ''})
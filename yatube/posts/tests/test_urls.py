@@ -1,10 +1,12 @@
 from http import HTTPStatus
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
-from django.test import TestCase, Client
-from django.urls import reverse
+from django.test import TestCase, Client, override_settings
+from django.urls import resolve, reverse
 
-from ..models import Group, Post
+from posts import urls as posts_urls
+from users import urls as users_urls
+from ..models import Comment, Follow, Group, Post
 
 User = get_user_model()
 
@@ -37,7 +39,8 @@ class ProjectURLTests(TestCase):
             reverse('posts:profile', args=(cls.post_author.username,)):
                 'posts/profile.html',
             reverse('posts:post_detail', args=(cls.post.id,)):
-                'posts/post_detail.html'
+                'posts/post_detail.html',
+            reverse('posts:search'): 'posts/search.html',
         }
 
     def setUp(self):
@@ -115,3 +118,156 @@ class ProjectURLTests(TestCase):
                 response = self.authors_client.get(address)
                 self.assertTemplateUsed(response, tmpl)
                 self.assertEqual(response.status_code, HTTPStatus.OK)
+
+
+@override_settings(QUERY_BUDGET_CHECKS=True)
+class QueryBudgetTests(TestCase):
+    """Every URL declares a query budget and stays within it."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='BudgetAuthor')
+        cls.reader = User.objects.create_user(
+            username='BudgetReader',
+            email='reader@example.com',
+            password='Qx7-lamp-orbit',
+        )
+        cls.group = Group.objects.create(
+            title='Budget group', slug='budget', description='Counted'
+        )
+        cls.posts = Post.objects.bulk_create(
+            Post(author=cls.author, group=cls.group, text=f'Post {number}')
+            for number in range(15)
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Commented post'
+        )
+        for number in range(5):
+            Comment.objects.create(
+                post=cls.post, author=cls.reader, text=f'Comment {number}'
+            )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_every_url_declares_a_budget(self):
+        for pattern in posts_urls.urlpatterns + users_urls.urlpatterns:
+            with self.subTest(url=pattern.name):
+                self.assertIsInstance(
+                    getattr(pattern.callback, 'query_budget', None), int
+                )
+
+    def test_views_stay_within_their_budgets(self):
+        post_url = reverse('posts:post_detail', args=(self.post.pk,))
+        requests = (
+            (self.client, 'get', reverse('posts:index'), None),
+            (self.reader_client, 'get', reverse('posts:index'), None),
+            (
+                self.reader_client,
+                'get',
+                reverse('posts:group_list', args=(self.group.slug,)),
+                None,
+            ),
+            (
+                self.reader_client,
+                'get',
+                reverse('posts:profile', args=(self.author.username,)),
+                None,
+            ),
+            (
+                self.reader_client,
+                'get',
+                reverse('posts:search'),
+                {'q': 'post'},
+            ),
+            (self.reader_client, 'get', post_url, None),
+            (self.author_client, 'get', post_url, None),
+            (
+                self.reader_client,
+                'get',
+                reverse('posts:post_comments', args=(self.post.pk,)),
+                {'cursor': ''},
+            ),
+            (self.reader_client, 'get', reverse('posts:follow_index'), None),
+            (self.author_client, 'get', reverse('posts:post_create'), None),
+            (
+                self.author_client,
+                'post',
+                reverse('posts:post_create'),
+                {'text': 'New post', 'group': self.group.pk},
+            ),
+            (
+                self.author_client,
+                'get',
+                reverse('posts:post_edit', args=(self.post.pk,)),
+                None,
+            ),
+            (
+                self.author_client,
+                'post',
+                reverse('posts:post_edit', args=(self.post.pk,)),
+                {'text': 'Edited post', 'group': self.group.pk},
+            ),
+            (
+                self.reader_client,
+                'post',
+                reverse('posts:add_comment', args=(self.post.pk,)),
+                {'text': 'One more comment'},
+            ),
+            (
+                self.reader_client,
+                'get',
+                reverse('posts:profile_unfollow', args=(self.author,)),
+                None,
+            ),
+            (
+                self.reader_client,
+                'get',
+                reverse('posts:profile_follow', args=(self.author,)),
+                None,
+            ),
+            (self.client, 'get', reverse('users:login'), None),
+            (
+                Client(),
+                'post',
+                reverse('users:login'),
+                {'username': 'BudgetReader', 'password': 'Qx7-lamp-orbit'},
+            ),
+            (self.client, 'get', reverse('users:signup'), None),
+            (
+                self.client,
+                'post',
+                reverse('users:signup'),
+                {
+                    'username': 'BudgetNewcomer',
+                    'password1': 'Qx7-lamp-orbit',
+                    'password2': 'Qx7-lamp-orbit',
+                },
+            ),
+            (self.client, 'get', reverse('users:pwd_reset'), None),
+            (
+                self.client,
+                'post',
+                reverse('users:pwd_reset'),
+                {'email': 'reader@example.com'},
+            ),
+            (self.reader_client, 'get', reverse('users:logout'), None),
+        )
+        for client, method, url, data in requests:
+            with self.subTest(method=method, url=url):
+                cache.clear()
+                response = getattr(client, method)(url, data)
+                self.assertIn(
+                    response.status_code, (HTTPStatus.OK, HTTPStatus.FOUND)
+                )
+                log = response.wsgi_request.query_log
+                budget = resolve(url).func.query_budget
+                self.assertLessEqual(
+                    len(log), budget, dict(log.by_template())
+                )
+        self.assertTrue(User.objects.filter(username='BudgetNewcomer'))
@@ -1,21 +1,57 @@
+from base64 import urlsafe_b64encode
+from contextlib import contextmanager
+from io import StringIO
+import json
 import random
 import shutil
 import tempfile
+import threading
+import time
+from unittest import mock
 
 from faker import Faker
 from django.conf import settings
 from django.core.cache import cache
+from django.core.management import call_command
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
 from http import HTTPStatus
-from django.test import Client, TestCase, override_settings
+from django.template.loader import get_template
+from django.test import (
+    Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from .. import cache as posts_cache
+from ..feed_merge import merge, recent_posts
 from ..forms import PostForm
-from ..models import Group, Post, Follow, User
+from ..models import Comment, FeedEntry, Group, Post, Follow, User
+from ..objects import cached_groups, cached_posts, cached_users
+from ..utils import ELLIPSIS, CachedCountPaginator, page_window
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
+@contextmanager
+def committed():
+    """Runs the on_commit callbacks of the writes in the block, as
+    their commit would; TestCase never commits. A backport of
+    captureOnCommitCallbacks(execute=True) from Django 3.2, the block
+    in a savepoint of its own like the transaction it stands for."""
+
+    start = len(connection.run_on_commit)
+    try:
+        with transaction.atomic():
+            yield
+    finally:
+        while len(connection.run_on_commit) > start:
+            callbacks = connection.run_on_commit[start:]
+            del connection.run_on_commit[start:]
+            for _, callback in callbacks:
+                callback()
+
+
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class ProjectViewsTests(TestCase):
 
@@ -181,6 +217,7 @@ class PaginatorViewsTest(TestCase):
             settings.POSTS_TO_DISPLAY + 1, 2 * settings.POSTS_TO_DISPLAY - 1
         )
         cls.authorized_user = User.objects.create_user(username='MrNobody')
+        cls.follower = User.objects.create_user(username='MrSomebody')
         cls.group = Group.objects.create(
             title='Test group for posts',
             description='Li group',
@@ -217,6 +254,158 @@ class PaginatorViewsTest(TestCase):
                     self.assertEqual(
                         len(response.context['page_obj']), posts)
 
+    def test_cursor_pagination_walks_every_post_once(self):
+        """Cursor mode visits every post exactly once going forward
+        and returns to the first page going back."""
+
+        Follow.objects.create(user=self.follower, author=self.authorized_user)
+        client = Client()
+        client.force_login(self.follower)
+        urls = {
+            'index': reverse('posts:index'),
+            'group_list': reverse('posts:group_list', args=(self.group.slug,)),
+            'profile': reverse('posts:profile', args=(self.authorized_user,)),
+            'follow_index': reverse('posts:follow_index'),
+        }
+        for name, url in urls.items():
+            with self.subTest(url=name):
+                cache.clear()
+                pages, cursor = [], ''
+                while cursor is not None:
+                    page_obj = client.get(
+                        url, data={'cursor': cursor}
+                    ).context['page_obj']
+                    pages.append(page_obj)
+                    cursor = page_obj.next_cursor
+                seen = [post.pk for page_obj in pages for post in page_obj]
+                self.assertEqual(len(seen), self.number_of_posts)
+                self.assertEqual(len(set(seen)), self.number_of_posts)
+                self.assertEqual(
+                    len(pages[0]), settings.POSTS_TO_DISPLAY
+                )
+                self.assertFalse(pages[0].has_previous())
+                previous = client.get(
+                    url, data={'cursor': pages[1].previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(list(previous), list(pages[0]))
+                self.assertFalse(previous.has_previous())
+
+    def test_broken_cursor_shows_first_page(self):
+        """An unparsable cursor falls back to the first page."""
+
+        response = self.client.get(
+            reverse('posts:index'), data={'cursor': 'not-a-cursor'}
+        )
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj), settings.POSTS_TO_DISPLAY)
+        self.assertFalse(page_obj.has_previous())
+
+    def test_tampered_cursor_shows_first_page(self):
+        """A well-formed token with values of the wrong count, types or
+        range falls back to the first page."""
+
+        post = Post.objects.create(author=self.authorized_user, text='C')
+        comment = Comment.objects.create(
+            post=post, author=self.authorized_user, text='Cursor'
+        )
+        urls = (
+            (reverse('posts:index'), 'cursor', 'page_obj'),
+            (
+                reverse('posts:post_detail', args=(post.pk,)),
+                'comments', 'comments',
+            ),
+            (
+                reverse('posts:post_comments', args=(post.pk,)),
+                'cursor', 'comments',
+            ),
+        )
+        for payload in (
+            ['n', ['garbage', 1]],
+            [{'a': 1}, 1],
+            ['n', [post.pub_date.isoformat(), 'one']],
+            ['n', [post.pub_date.isoformat(), {'a': 1}]],
+            ['n', [post.pub_date.isoformat()]],
+            ['n', [[], 1]],
+            ['n', [post.pub_date.isoformat(), 10 ** 30]],
+            ['n', [post.pub_date.isoformat(), float('inf')]],
+            'n',
+        ):
+            token = urlsafe_b64encode(
+                json.dumps(payload).encode()
+            ).decode().rstrip('=')
+            for url, parameter, name in urls:
+                with self.subTest(payload=payload, url=url):
+                    cache.clear()
+                    response = self.client.get(url, {parameter: token})
+                    self.assertEqual(response.status_code, HTTPStatus.OK)
+                    page = response.context[name]
+                    self.assertFalse(page.has_previous())
+        self.assertIn(comment, page)
+
+    def test_list_counts_are_cached_until_posts_change(self):
+        """Paginated lists reuse the cached total and drop it
+        when a post is published or deleted."""
+
+        urls = (
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.authorized_user,)),
+        )
+
+        def counts():
+            return [
+                self.client.get(url).context['page_obj'].paginator.count
+                for url in urls
+            ]
+
+        total = self.number_of_posts
+        self.assertEqual(counts(), [total, total])
+        Post.objects.bulk_create([Post(
+            author=self.authorized_user,
+            text=self.fake.text(),
+            group=self.group
+        )])
+        posts_cache.bump(posts_cache.SITE)
+        self.assertEqual(counts(), [total, total])
+        with committed():
+            post = Post.objects.create(
+                author=self.authorized_user,
+                text=self.fake.text(),
+                group=self.group
+            )
+        self.assertEqual(counts(), [total + 2, total + 2])
+        with committed():
+            post.delete()
+        self.assertEqual(counts(), [total + 1, total + 1])
+
+    def test_paginator_renders_a_bounded_page_window(self):
+        """The page links around the current page are elided,
+        so their number doesn't grow with the number of pages."""
+
+        template = get_template('posts/includes/paginator.html')
+        for posts in (10 ** 3, 10 ** 6):
+            with self.subTest(posts=posts):
+                paginator = CachedCountPaginator(
+                    range(posts), settings.POSTS_TO_DISPLAY
+                )
+                page = paginator.page(paginator.num_pages // 2)
+                html = template.render({'page_obj': page})
+                self.assertEqual(html.count('class="page-item'), 13)
+                self.assertIn(f'?page={paginator.num_pages}"', html)
+                self.assertIn(f'<span class="page-link">{page.number}', html)
+
+    def test_page_window_elides_gaps_of_two_pages_or_more(self):
+        self.assertEqual(
+            list(page_window(5, 100)), [1, 2, 3, 4, 5, 6, 7, ELLIPSIS, 100]
+        )
+        self.assertEqual(
+            list(page_window(6, 100)),
+            [1, ELLIPSIS, 4, 5, 6, 7, 8, ELLIPSIS, 100],
+        )
+        self.assertEqual(
+            list(page_window(96, 100)),
+            [1, ELLIPSIS, 94, 95, 96, 97, 98, 99, 100],
+        )
+
 
 class SubscriptionsTests(TestCase):
 
@@ -254,6 +443,40 @@ class SubscriptionsTests(TestCase):
     def setUp(cls):
         cache.clear()
 
+    def test_cold_feed_issues_its_versions_at_once(self):
+        """The followed authors are read once per request and their
+        missing versions are stored in one cache write."""
+
+        authors = User.objects.bulk_create(
+            User(username=f'Versioned{number}') for number in range(30)
+        )
+        Follow.objects.bulk_create(
+            Follow(user=self.user_a, author=author)
+            for author in User.objects.filter(username__in=[
+                author.username for author in authors
+            ])
+        )
+        writes = []
+        set_many = cache.set_many
+
+        def recording_set_many(data, *args, **kwargs):
+            writes.append([
+                key for key in data if key.startswith('posts:version:')
+            ])
+            return set_many(data, *args, **kwargs)
+
+        with mock.patch(
+            'posts.cache.followed_authors', wraps=posts_cache.followed_authors
+        ) as followed, mock.patch.object(
+            cache, 'set_many', recording_set_many
+        ), mock.patch.object(cache, 'add') as add:
+            response = self.client_a.get(self.index_url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        followed.assert_called_once()
+        add.assert_not_called()
+        self.assertEqual(len([keys for keys in writes if keys]), 1)
+        self.assertEqual(len(max(writes, key=len)), 32)
+
     def test_post_visibility_after_post_creation(self):
         """Creates a post and makes sure it's visible to a subscriber
         and isn't visible to someone who isn't subscribed."""
@@ -286,7 +509,8 @@ class SubscriptionsTests(TestCase):
         )
         self.assertNotIn(test_post, response_a.context['page_obj'])
         self.assertNotIn(test_post, response_b.context['page_obj'])
-        Follow.objects.create(user=self.user_a, author=self.author)
+        with committed():
+            Follow.objects.create(user=self.user_a, author=self.author)
         response_a = self.client_a.get(self.index_url)
         response_b = self.client_b.get(self.index_url)
         self.assertEqual(test_post, response_a.context['page_obj'][0])
@@ -330,6 +554,156 @@ class SubscriptionsTests(TestCase):
             ).exists()
         )
 
+    def test_follow_checks_read_the_cached_follow_graph(self):
+        """Subscription state comes from the remembered set of followed
+        authors, which follows every subscribe and unsubscribe."""
+
+        profile_url = reverse('posts:profile', args=(self.author,))
+        self.client_a.get(profile_url)
+        for url, button in (
+            (self.follow_url, self.unfollow_url),
+            (self.unfollow_url, self.follow_url),
+        ):
+            with self.subTest(url=url):
+                with committed():
+                    self.client_a.get(url)
+                self.client_a.get(profile_url)
+                # Neither the button nor a repeated click reads Follow.
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client_a.get(profile_url)
+                    self.client_a.get(url)
+                self.assertContains(response, button)
+                self.assertFalse([
+                    query for query in queries
+                    if 'posts_follow' in query['sql']
+                ])
+
+    def test_follow_of_a_missing_author(self):
+        response = self.client_a.get(
+            reverse('posts:profile_follow', args=('Nobody',))
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_unsubscription_removes_posts_from_feed(self):
+        """Author's posts leave the feed after unsubscribing and
+        are not put into it when published later."""
+
+        Follow.objects.create(user=self.user_a, author=self.author)
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.user_a).exists()
+        )
+        self.client_a.get(self.unfollow_url)
+        test_post = Post.objects.create(
+            author=self.author,
+            text=self.fake.text(),
+            group=self.group
+        )
+        response = self.client_a.get(self.index_url)
+        self.assertFalse(
+            FeedEntry.objects.filter(user=self.user_a).exists()
+        )
+        self.assertNotIn(test_post, response.context['page_obj'])
+
+    def test_feed_is_ordered_and_deleted_posts_disappear(self):
+        """Feed shows newest posts first, deleted posts vanish."""
+
+        Follow.objects.create(user=self.user_a, author=self.author)
+        first = Post.objects.create(author=self.author, text='First')
+        last = Post.objects.create(author=self.author, text='Last')
+        page_obj = self.client_a.get(self.index_url).context['page_obj']
+        self.assertEqual(page_obj[0], last)
+        self.assertEqual(page_obj[1], first)
+        last.delete()
+        page_obj = self.client_a.get(self.index_url).context['page_obj']
+        self.assertNotIn(last, page_obj)
+
+    def test_merged_feed_matches_the_feed_table(self):
+        """Fan-out on read shows the pages the feed table does, the
+        recent lists deep enough or not."""
+
+        authors = [self.author] + [
+            User.objects.create_user(username=f'Merged{number}')
+            for number in range(3)
+        ]
+        for author in authors:
+            Follow.objects.create(user=self.user_a, author=author)
+        for number in range(24):
+            Post.objects.create(author=authors[number % 4], text='Merged')
+        pages = range(1, 5)
+
+        def feed():
+            return [
+                [post.pk for post in self.client_a.get(
+                    self.index_url, {'page': page}
+                ).context['page_obj']]
+                for page in pages
+            ]
+
+        expected = feed()
+        for depth in (100, 7, 1):
+            with self.subTest(depth=depth), override_settings(
+                FEED_ENGINE='merge', FEED_RECENT_POSTS=depth
+            ):
+                cache.clear()
+                self.assertEqual(feed(), expected)
+        with override_settings(FEED_ENGINE='merge'), committed():
+            Post.objects.create(author=authors[1], text='Newest')
+            newest = feed()[0][0]
+        self.assertEqual(newest, Post.objects.latest('pub_date').pk)
+        with override_settings(
+            FEED_ENGINE='merge', FEED_MERGE_MAX_AUTHORS=3
+        ), mock.patch('posts.views.MergedFeed') as merged:
+            self.client_a.get(self.index_url)
+        merged.assert_not_called()
+
+    def test_merge_stops_at_incomplete_lists(self):
+        lists = [(True, [(3, 'c'), (1, 'a')]), (False, [(4, 'd'), (2, 'b')])]
+        self.assertEqual(merge(lists, 0, 2), ['d', 'c'])
+        self.assertEqual(merge(lists, 1, 3), ['c', 'b'])
+        self.assertIsNone(merge(lists, 2, 4))
+        self.assertEqual(merge(lists[:1], 0, 5), ['c', 'a'])
+
+    def test_backfill_feed_command_rebuilds_feed(self):
+        """The backfill command restores a wiped feed table."""
+
+        Follow.objects.create(user=self.user_a, author=self.author)
+        expected = FeedEntry.objects.count()
+        FeedEntry.objects.all().delete()
+        call_command('backfill_feed', stdout=StringIO())
+        self.assertEqual(FeedEntry.objects.count(), expected)
+        self.assertEqual(
+            expected, Post.objects.filter(author=self.author).count()
+        )
+
+
+class MergedFeedCommitTests(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='Racer')
+
+    def test_recent_posts_read_before_the_commit_are_forgotten(self):
+        """A request reading the author's recent posts from another
+        connection while the new post is not committed caches the old
+        list; the commit drops it."""
+
+        read = []
+
+        def concurrent_request():
+            try:
+                read.append(recent_posts([self.author.pk]))
+            finally:
+                connection.close()
+
+        with transaction.atomic():
+            post = Post.objects.create(author=self.author, text='Racing')
+            request = threading.Thread(target=concurrent_request)
+            request.start()
+            request.join()
+        self.assertEqual(read, [{self.author.pk: (True, [])}])
+        complete, entries = recent_posts([self.author.pk])[self.author.pk]
+        self.assertEqual([pk for _, pk in entries], [post.pk])
+
 
 class ProjectCacheTests(TestCase):
 
@@ -354,7 +728,7 @@ class ProjectCacheTests(TestCase):
         cache.clear()
 
     def test_index_cache_is_working(self):
-        """Checks if the main page is cached."""
+        """The main page is served from the cache until posts change."""
 
         index_url = reverse('posts:index')
         test_post = Post.objects.create(
@@ -365,10 +739,503 @@ class ProjectCacheTests(TestCase):
 
         response = self.client.get(index_url)
         first_content = response.content
+        self.assertEqual(response['X-Cache'], 'MISS')
         self.assertEqual(test_post, response.context['page_obj'][0])
-        test_post.delete()
+        Post.objects.bulk_create([Post(
+            author=self.authorized_user,
+            text='Written behind the signals back.',
+        )])
         response = self.client.get(index_url)
+        self.assertEqual(response['X-Cache'], 'HIT')
         self.assertEqual(response.content, first_content)
         cache.clear()
         response = self.client.get(index_url)
         self.assertNotEqual(response.content, first_content)
+
+    def test_index_cache_is_invalidated_by_writes(self):
+        """Post, group and user changes drop the cached main page."""
+
+        index_url = reverse('posts:index')
+        changes = {
+            'post created': lambda: Post.objects.create(
+                author=self.authorized_user, text='Fresh news'
+            ),
+            'post deleted': lambda: Post.objects.latest('pk').delete(),
+            'group renamed': lambda: Group.objects.filter(
+                pk=self.test_group.pk
+            ).get().save(),
+            'user renamed': lambda: self.authorized_user.save(),
+        }
+        for change, apply in changes.items():
+            with self.subTest(change=change):
+                self.client.get(index_url)
+                response = self.client.get(index_url)
+                self.assertEqual(response['X-Cache'], 'HIT')
+                with committed():
+                    apply()
+                response = self.client.get(index_url)
+                self.assertEqual(response['X-Cache'], 'MISS')
+        hits, misses = posts_cache.stats('index')['index']
+        self.assertEqual((hits, misses), (7, 5))
+
+    def test_pages_are_invalidated_when_the_write_commits(self):
+        """Until the write commits, the cached page stays in place,
+        so no request can cache the old rows under a new version."""
+
+        index_url = reverse('posts:index')
+        self.client.get(index_url)
+        with committed():
+            Post.objects.create(author=self.authorized_user, text='Pending')
+            self.assertEqual(self.client.get(index_url)['X-Cache'], 'HIT')
+        self.assertEqual(self.client.get(index_url)['X-Cache'], 'MISS')
+
+    def test_post_delete_invalidates_once_whatever_its_comments(self):
+        """The comments going with a post add no page invalidation or
+        counter update of their own: the post's covers them."""
+
+        def delete(comments):
+            post = Post.objects.create(
+                author=self.authorized_user, group=self.test_group, text='C'
+            )
+            Comment.objects.bulk_create(
+                Comment(post=post, author=self.authorized_user, text='C')
+                for _ in range(comments)
+            )
+            with CaptureQueriesContext(connection) as queries, mock.patch(
+                'posts.cache.bump', wraps=posts_cache.bump
+            ) as bump, committed():
+                post.delete()
+            bump.assert_called_once()
+            return len(queries)
+
+        self.assertEqual(delete(30), delete(1))
+
+    def test_login_does_not_drop_the_cache(self):
+        """Updating last_login on sign-in keeps cached pages."""
+
+        index_url = reverse('posts:index')
+        self.client.get(index_url)
+        self.client.force_login(self.authorized_user)
+        with committed():
+            self.authorized_user.save(update_fields=['last_login'])
+        self.client.logout()
+        response = self.client.get(index_url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+    def test_index_cache_is_shared_between_users(self):
+        """One cached page serves everybody, the header is per user."""
+
+        index_url = reverse('posts:index')
+        other_client = Client()
+        other_client.force_login(
+            User.objects.create_user(username='AnotherTester')
+        )
+        visitors = {
+            'anonymous': (self.client, 'Log In', 'MISS'),
+            'InsaneTester': (
+                self.authorized_client, 'User: InsaneTester', 'HIT'
+            ),
+            'AnotherTester': (
+                other_client, 'User: AnotherTester', 'HIT'
+            ),
+        }
+        for visitor, (client, greeting, outcome) in visitors.items():
+            with self.subTest(visitor=visitor):
+                response = client.get(index_url)
+                self.assertEqual(response['X-Cache'], outcome)
+                self.assertContains(response, greeting)
+                self.assertNotContains(response, '<!--personal:')
+        self.assertNotContains(
+            self.client.get(index_url), 'Chosen authors'
+        )
+        self.assertContains(
+            self.authorized_client.get(index_url), 'Chosen authors'
+        )
+
+    def test_object_pages_are_cached_and_invalidated(self):
+        """Group, profile and post pages are cached until a write
+        in their scope."""
+
+        reader = User.objects.create_user(username='Reader')
+        group_url = reverse('posts:group_list', args=(self.test_group.slug,))
+        profile_url = reverse(
+            'posts:profile', args=(self.authorized_user.username,)
+        )
+        post_url = reverse('posts:post_detail', args=(self.test_post.id,))
+        changes = {
+            'comment': (post_url, lambda: Comment.objects.create(
+                post=self.test_post, author=reader, text='First!'
+            )),
+            'subscription': (profile_url, lambda: Follow.objects.create(
+                user=reader, author=self.authorized_user
+            )),
+            'post moved': (group_url, lambda: Post.objects.filter(
+                pk=self.test_post.pk
+            ).get().save()),
+            'author posted': (post_url, lambda: Post.objects.create(
+                author=self.authorized_user, text='Counted on the post page'
+            )),
+        }
+        for change, (url, apply) in changes.items():
+            with self.subTest(change=change):
+                self.client.get(url)
+                self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+                with committed():
+                    apply()
+                self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+
+    def test_personal_parts_of_cached_pages(self):
+        """Edit button and subscription button are per user
+        even when the page comes from the cache."""
+
+        reader = User.objects.create_user(username='Reader')
+        reader_client = Client()
+        reader_client.force_login(reader)
+        Follow.objects.create(user=reader, author=self.authorized_user)
+        post_url = reverse('posts:post_detail', args=(self.test_post.id,))
+        profile_url = reverse(
+            'posts:profile', args=(self.authorized_user.username,)
+        )
+        edit_url = reverse('posts:post_edit', args=(self.test_post.id,))
+        follow_url = reverse(
+            'posts:profile_follow', args=(self.authorized_user.username,)
+        )
+        unfollow_url = reverse(
+            'posts:profile_unfollow', args=(self.authorized_user.username,)
+        )
+        self.assertContains(self.authorized_client.get(post_url), edit_url)
+        response = reader_client.get(post_url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertNotContains(response, edit_url)
+        self.assertContains(response, 'Add Comment')
+        self.assertNotContains(self.client.get(post_url), 'Add Comment')
+        self.assertContains(reader_client.get(profile_url), unfollow_url)
+        response = self.client.get(profile_url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertContains(response, follow_url)
+        self.assertNotContains(response, unfollow_url)
+        response = self.authorized_client.get(profile_url)
+        self.assertNotContains(response, follow_url)
+        self.assertNotContains(response, unfollow_url)
+
+    def test_outdated_page_is_served_stale_while_rebuilt(self):
+        """While one request rebuilds an outdated page, the others get
+        the previous copy instead of rendering it too."""
+
+        index_url = reverse('posts:index')
+        first = self.client.get(index_url)
+        with committed():
+            Post.objects.create(
+                author=self.authorized_user, text='Newest post'
+            )
+        lock = posts_cache.LOCK_KEY.format(posts_cache.page_key(
+            RequestFactory().get(index_url), 'index'
+        ))
+        cache.add(lock, True)
+        response = self.client.get(index_url)
+        self.assertEqual(response['X-Cache'], 'STALE')
+        self.assertEqual(response.content, first.content)
+        self.assertEqual(response['ETag'], first['ETag'])
+        cache.delete(lock)
+        response = self.client.get(index_url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertContains(response, 'Newest post')
+        self.assertIsNone(cache.get(lock))
+
+    def test_pages_expire_early_with_a_probability(self):
+        """XFetch: a slow page near its expiry is rebuilt ahead of time,
+        a quick one far from it is not."""
+
+        page = posts_cache.CachedPage([1], time.time() + 5, 0.01, None)
+        slow = page._replace(delta=10)
+        with mock.patch('posts.cache.random.random', return_value=0.5):
+            self.assertTrue(posts_cache.is_fresh(page, [1]))
+            self.assertFalse(posts_cache.is_fresh(page, [2]))
+            self.assertFalse(posts_cache.is_fresh(slow, [1]))
+
+    def test_unchanged_pages_answer_not_modified(self):
+        """A repeated request with the page ETag gets an empty 304
+        until a write in the page scopes, the feed included."""
+
+        reader = User.objects.create_user(username='Reader')
+        reader_client = Client()
+        reader_client.force_login(reader)
+        post_url = reverse('posts:post_detail', args=(self.test_post.id,))
+        changes = {
+            'post published': (
+                self.client,
+                reverse('posts:index'),
+                lambda: Post.objects.create(
+                    author=self.authorized_user, text='Fresh post'
+                ),
+            ),
+            'comment': (self.client, post_url, lambda: Comment.objects.create(
+                post=self.test_post, author=reader, text='Changed!'
+            )),
+            'subscription': (
+                reader_client,
+                reverse('posts:follow_index'),
+                lambda: Follow.objects.create(
+                    user=reader, author=self.authorized_user
+                ),
+            ),
+            'followed author edited': (
+                reader_client,
+                reverse('posts:follow_index'),
+                lambda: Post.objects.filter(
+                    pk=self.test_post.pk
+                ).get().save(),
+            ),
+            'followed post commented': (
+                reader_client,
+                reverse('posts:follow_index'),
+                lambda: Comment.objects.create(
+                    post=self.test_post, author=reader, text='In the feed'
+                ),
+            ),
+        }
+        for change, (client, url, apply) in changes.items():
+            with self.subTest(change=change):
+                etag = client.get(url)['ETag']
+                response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED
+                )
+                self.assertEqual(response.content, b'')
+                self.assertEqual(response['ETag'], etag)
+                with committed():
+                    apply()
+                response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_differs_between_visitors(self):
+        """Personal fragments make the same page differ per visitor."""
+
+        post_url = reverse('posts:post_detail', args=(self.test_post.id,))
+        etag = self.authorized_client.get(post_url)['ETag']
+        response = self.client.get(post_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn('private', response['Cache-Control'])
+
+
+class WarmCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Popular')
+        cls.group = Group.objects.create(title='Hot', slug='hot')
+        cls.quiet_group = Group.objects.create(title='Quiet', slug='quiet')
+        cls.posts = Post.objects.bulk_create(
+            Post(author=cls.author, group=cls.group, text=f'Hot {number}')
+            for number in range(settings.POSTS_TO_DISPLAY + 1)
+        )
+        cls.talked_about = Post.objects.create(
+            author=cls.author, text='Talked about'
+        )
+        Comment.objects.create(
+            post=cls.talked_about, author=cls.author, text='Indeed'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_warm_cache_renders_the_hot_pages(self):
+        out = StringIO()
+        call_command(
+            'warm_cache', index=2, groups=1, profiles=1, posts=1,
+            workers=1, stdout=out,
+        )
+        self.assertIn('Warmed 5 pages', out.getvalue())
+        for url, data in (
+            (reverse('posts:index'), {}),
+            (reverse('posts:index'), {'page': 2}),
+            (reverse('posts:group_list', args=(self.group.slug,)), {}),
+            (reverse('posts:profile', args=(self.author.username,)), {}),
+            (reverse('posts:post_detail', args=(self.talked_about.pk,)), {}),
+        ):
+            with self.subTest(url=url, data=data):
+                self.assertEqual(self.client.get(url, data)['X-Cache'], 'HIT')
+        quiet_url = reverse('posts:group_list', args=(self.quiet_group.slug,))
+        self.assertEqual(self.client.get(quiet_url)['X-Cache'], 'MISS')
+
+
+class ObjectCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='Cached', password='Qx7-lamp-orbit'
+        )
+        cls.group = Group.objects.create(title='Cached', slug='cached')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Cached {number}'
+            )
+            for number in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_lookups_are_read_through_once(self):
+        post = self.posts[0]
+        with self.assertNumQueries(1):
+            cached = cached_posts.get(pk=post.pk)
+            self.assertEqual(cached.author.username, 'Cached')
+            self.assertEqual(cached.group.slug, 'cached')
+        with self.assertNumQueries(0):
+            self.assertEqual(cached_posts.get(pk=post.pk), post)
+            cached_posts.get(pk=post.pk).author.username
+        with self.assertNumQueries(1):
+            found = cached_posts.get_many(
+                [post.pk for post in self.posts] + [0]
+            )
+        self.assertEqual(set(found), {post.pk for post in self.posts})
+        with self.assertNumQueries(1):
+            self.assertEqual(cached_users.get(username='Cached'), self.author)
+        with self.assertNumQueries(0):
+            self.assertEqual(cached_users.get(username='Cached'), self.author)
+        self.assertNotIn('password', vars(cached_users.get(pk=self.author.pk)))
+
+    def test_changes_are_not_served_from_the_cache(self):
+        post = Post.objects.get(pk=self.posts[0].pk)
+        cached_posts.get(pk=post.pk)
+        post.text = 'Edited'
+        with committed():
+            post.save()
+        self.assertEqual(cached_posts.get(pk=post.pk).text, 'Edited')
+        with committed():
+            Comment.objects.create(post=post, author=self.author, text='Hi')
+        self.assertEqual(cached_posts.get(pk=post.pk).comments_count, 1)
+        cached_groups.get(slug='cached')
+        self.group.slug = 'renamed'
+        with committed():
+            self.group.save()
+        with self.assertRaises(Group.DoesNotExist):
+            cached_groups.get(slug='cached')
+        self.assertEqual(
+            cached_posts.get(pk=post.pk).group.slug, 'renamed'
+        )
+        with committed():
+            post.delete()
+        with self.assertRaises(Post.DoesNotExist):
+            cached_posts.get(pk=post.pk)
+
+
+class CommentPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Talker')
+        cls.post = Post.objects.create(author=cls.author, text='Viral post')
+        cls.number_of_comments = 2 * settings.COMMENTS_TO_DISPLAY + 5
+        # One bulk insert gives many comments the same creation time.
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.author, text=f'Reply {number}')
+            for number in range(cls.number_of_comments)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_page_renders_a_bounded_number_of_comments(self):
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.pk,))
+        )
+        comments = response.context['comments']
+        self.assertEqual(len(comments), settings.COMMENTS_TO_DISPLAY)
+        self.assertContains(
+            response, f'?comments={comments.next_cursor}"'
+        )
+
+    def test_fragments_walk_every_comment_once(self):
+        """The fragment pages continue the first page newest first."""
+
+        comments = self.client.get(
+            reverse('posts:post_detail', args=(self.post.pk,))
+        ).context['comments']
+        seen = [comment.pk for comment in comments]
+        url = reverse('posts:post_comments', args=(self.post.pk,))
+        while comments.has_next():
+            response = self.client.get(url, {'cursor': comments.next_cursor})
+            self.assertTemplateUsed(response, 'includes/comment_list.html')
+            self.assertNotContains(response, '<html')
+            comments = response.context['comments']
+            seen += [comment.pk for comment in comments]
+        self.assertEqual(seen, list(Comment.objects.filter(
+            post=self.post
+        ).order_by('-created', '-pk').values_list('pk', flat=True)))
+
+    def test_comment_fragment_of_a_missing_post(self):
+        response = self.client.get(
+            reverse('posts:post_comments', args=(self.post.pk + 1,))
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Searcher')
+        cls.admin_client = Client()
+        cls.admin_client.force_login(User.objects.create_superuser(
+            username='SearchAdmin', email='admin@example.com', password='x'
+        ))
+        cls.posts = [
+            Post.objects.create(author=cls.author, text=text)
+            for text in (
+                'Cats are running through the garden',
+                'A garden of cats, cats and more cats',
+                'Dogs sleep in the garden',
+            )
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def found(self, query):
+        response = self.client.get(reverse('posts:search'), {'q': query})
+        return list(response.context['page_obj'])
+
+    def test_search_ranks_posts_containing_every_word(self):
+        self.assertEqual(self.found('cats garden'), self.posts[1::-1])
+        self.assertEqual(self.found('run'), [self.posts[0]])
+        self.assertEqual(self.found('"); DROP --'), [])
+        self.assertEqual(self.found(''), [])
+
+    def test_search_index_follows_edits_and_deletes(self):
+        post = self.posts[2]
+        post.text = 'Dogs chase cats'
+        post.save()
+        self.assertIn(post, self.found('cats'))
+        self.assertEqual(self.found('sleep'), [])
+        post.delete()
+        self.assertEqual(self.found('dogs'), [])
+        call_command('rebuild_search', stdout=StringIO())
+        self.assertEqual(len(self.found('garden')), 2)
+
+    def test_search_results_are_paginated_with_the_query(self):
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Paged cats {number}')
+            for number in range(settings.POSTS_TO_DISPLAY)
+        )
+        call_command('rebuild_search', stdout=StringIO())
+        posts_cache.bump('index')
+        response = self.client.get(reverse('posts:search'), {'q': 'cats'})
+        self.assertEqual(response.context['page_obj'].paginator.count, 12)
+        self.assertContains(response, 'href="?q=cats&amp;page=2"')
+
+    def test_admin_search_uses_the_index(self):
+        response = self.admin_client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'cats garden'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list), self.posts[1::-1]
+        )
+        response = self.admin_client.get(
+            reverse('admin:posts_post_changelist'), {'q': '!!!'}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertFalse(response.context['cl'].result_list)
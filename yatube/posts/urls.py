@@ -1,28 +1,53 @@
 from django.urls import path
 
+from core.queries import query_budget
 from . import views
 
 app_name = 'posts'
 
 urlpatterns = [
-    path('', views.index, name='index'),
-    path('group/<slug:slug>/', views.group_posts, name='group_list'),
-    path('profile/<str:username>/', views.profile, name='profile'),
-    path('create/', views.post_create, name='post_create'),
-    path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
-    path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('', query_budget(5)(views.index), name='index'),
     path(
-        'posts/<int:post_id>/comment/', views.add_comment, name='add_comment'
+        'group/<slug:slug>/',
+        query_budget(6)(views.group_posts),
+        name='group_list'
     ),
-    path('follow/', views.follow_index, name='follow_index'),
+    path(
+        'profile/<str:username>/',
+        query_budget(7)(views.profile),
+        name='profile'
+    ),
+    path('search/', query_budget(5)(views.post_search), name='search'),
+    path('create/', query_budget(14)(views.post_create), name='post_create'),
+    path(
+        'posts/<int:post_id>/edit/',
+        query_budget(11)(views.post_edit),
+        name='post_edit'
+    ),
+    path(
+        'posts/<int:post_id>/',
+        query_budget(6)(views.post_detail),
+        name='post_detail'
+    ),
+    path(
+        'posts/<int:post_id>/comments/',
+        query_budget(4)(views.post_comments),
+        name='post_comments'
+    ),
+    path(
+        'posts/<int:post_id>/comment/',
+        query_budget(10)(views.add_comment),
+        name='add_comment'
+    ),
+    path('follow/', query_budget(5)(views.follow_index), name='follow_index'),
     path(
         'profile/<str:username>/follow/',
-        views.profile_follow,
+        query_budget(14)(views.profile_follow),
         name='profile_follow'
     ),
     path(
         'profile/<str:username>/unfollow/',
-        views.profile_unfollow,
+        query_budget(13)(views.profile_unfollow),
         name='profile_unfollow'
     ),
 ]
@@ -1,10 +1,282 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as DecodeError
+from collections.abc import Sequence
+from datetime import date
+from itertools import islice
+
 from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.db.models import DateTimeField, F, Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+CURSOR_KEYS = ('pub_date', 'pk')
+COMMENT_CURSOR_KEYS = ('created', 'pk')
+NEXT, PREVIOUS = 'n', 'p'
+COUNT_KEY = 'posts:count:{}'
+ELLIPSIS = '…'
+
+
+def count_key(scope, pk=None):
+    """Cache key of a list length: index, group, author or feed."""
+
+    return COUNT_KEY.format(scope if pk is None else f'{scope}:{pk}')
+
+
+def forget_counts(*keys):
+    cache.delete_many(keys)
+
+
+def batched(iterable, size):
+    """Lists of up to ``size`` items, so long streams never sit in memory."""
+
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def page_window(number, num_pages, on_each_side=2, on_ends=1):
+    """Page numbers to link from page ``number``, elided with ELLIPSIS.
+
+    For page 50 of 100: 1 … 48 49 50 51 52 … 100. The window size does
+    not depend on ``num_pages``, so the paginator renders in flat time.
+    Only gaps of two pages or more are elided, a single page is shown.
+    """
+
+    if num_pages <= (on_each_side + on_ends) * 2 + 1:
+        yield from range(1, num_pages + 1)
+        return
+    if number > on_each_side + on_ends + 2:
+        yield from range(1, on_ends + 1)
+        yield ELLIPSIS
+        start = number - on_each_side
+    else:
+        start = 1
+    if number < num_pages - on_each_side - on_ends - 1:
+        yield from range(start, number + on_each_side + 1)
+        yield ELLIPSIS
+        yield from range(num_pages - on_ends + 1, num_pages + 1)
+    else:
+        yield from range(start, num_pages + 1)
+
+
+class WindowPage(Page):
+
+    ELLIPSIS = ELLIPSIS
+
+    @property
+    def page_window(self):
+        return page_window(self.number, self.paginator.num_pages)
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator that keeps the list length in the cache.
+
+    The count is taken once and then served from the cache until
+    ``posts.signals`` drops the key on a post or subscription change,
+    so a page costs one LIMIT/OFFSET query instead of COUNT(*) plus it.
+    """
+
+    def __init__(self, object_list, per_page, count_key=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_key = count_key
+
+    def _get_page(self, *args, **kwargs):
+        return WindowPage(*args, **kwargs)
+
+    @cached_property
+    def count(self):
+        if self.count_key is None:
+            return Paginator.count.func(self)
+        count = cache.get(self.count_key)
+        if count is None:
+            count = Paginator.count.func(self)
+            cache.set(self.count_key, count, settings.LIST_COUNT_TIMEOUT)
+        return count
+
+
+class CursorEncoder(json.JSONEncoder):
+    """Keeps full microsecond precision, unlike DjangoJSONEncoder."""
+
+    def default(self, o):
+        if isinstance(o, date):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(direction, values):
+    payload = json.dumps([direction, values], cls=CursorEncoder)
+    return urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def bigint(value):
+    """``int(value)`` within the 64-bit range the databases store."""
+
+    number = int(value)
+    if not -2 ** 63 <= number < 2 ** 63:
+        raise ValueError(f'{number} is out of the 64-bit range')
+    return number
+
+
+def key_parsers(model, keys):
+    """A parser of the cursor value of every key of ``model`` rows:
+    parse_datetime for datetimes, bigint for the rest."""
+
+    parsers = []
+    for key in keys:
+        *path, name = key.split('__')
+        owner = model
+        for step in path:
+            owner = owner._meta.get_field(step).related_model
+        field = owner._meta.pk if name == 'pk' else owner._meta.get_field(name)
+        parsers.append(
+            parse_datetime if isinstance(field, DateTimeField) else bigint
+        )
+    return parsers
+
+
+def decode_cursor(token, parsers):
+    """Returns (direction, values) or None for a missing or broken token.
+
+    ``parsers`` turn the values into the types of the keys; a token with
+    another number of values or one that doesn't parse is broken.
+    """
+
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        direction, values = json.loads(urlsafe_b64decode(padded))
+        if direction not in (NEXT, PREVIOUS) or not isinstance(values, list):
+            return None
+        if len(values) != len(parsers):
+            return None
+        values = [parse(value) for parse, value in zip(parsers, values)]
+    except (DecodeError, ValueError, TypeError, OverflowError):
+        return None
+    if None in values:
+        return None
+    return direction, values
+
+
+class CursorPage(Sequence):
+    """A page of a keyset-paginated list with opaque neighbour tokens.
+
+    Mirrors the parts of ``django.core.paginator.Page`` the templates use,
+    but never counts or offsets: every page is a range scan from the cursor.
+    """
+
+    is_cursor = True
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def _keyset_filter(keys, values, direction):
+    """(k0, k1) < (v0, v1) spelled out for the ORM, or > going back."""
+
+    lookup = 'lt' if direction == NEXT else 'gt'
+    condition = Q()
+    for position in reversed(range(len(keys))):
+        equal = {keys[i]: values[i] for i in range(position)}
+        step = Q(**equal, **{f'{keys[position]}__{lookup}': values[position]})
+        condition = step | condition if condition else step
+    return condition
+
+
+def cursor_page(queryset, token, per_page, keys=CURSOR_KEYS):
+    """Keyset pagination over ``keys`` in descending order."""
+
+    aliases = [f'cursor_{i}' for i in range(len(keys))]
+    queryset = queryset.annotate(
+        **{alias: F(key) for alias, key in zip(aliases, keys)}
+    )
+    cursor = decode_cursor(token, key_parsers(queryset.model, keys))
+    if cursor:
+        direction, values = cursor
+        queryset = queryset.filter(_keyset_filter(aliases, values, direction))
+    else:
+        direction = None
+    descending = [f'-{alias}' for alias in aliases]
+    if direction == PREVIOUS:
+        rows = list(queryset.order_by(*aliases)[:per_page + 1])
+        more = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        has_next, has_previous = True, more
+    else:
+        rows = list(queryset.order_by(*descending)[:per_page + 1])
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        has_previous = direction == NEXT
+    if not rows:
+        return CursorPage(rows)
+
+    def values_of(obj):
+        return [getattr(obj, alias) for alias in aliases]
+
+    return CursorPage(
+        rows,
+        next_cursor=(
+            encode_cursor(NEXT, values_of(rows[-1])) if has_next else None
+        ),
+        previous_cursor=(
+            encode_cursor(PREVIOUS, values_of(rows[0]))
+            if has_previous else None
+        ),
+    )
+
+
+def cursor_mode(request):
+    return 'cursor' in request.GET or (
+        settings.PAGINATION_MODE == 'cursor' and 'page' not in request.GET
+    )
+
 
-from django.core.paginator import Paginator
+def list_page(list, request, keys=CURSOR_KEYS, count_key=None,
+              prefetch=None):
+    """Paginates ``list`` by page number or, in cursor mode, by keyset.
 
+    Cursor mode is used when the request carries a ``cursor`` parameter
+    or ``PAGINATION_MODE`` is ``'cursor'`` and no page number is given;
+    it only checks whether a next page exists and never counts. Numbered
+    pages take the total from the cache under ``count_key``, if given.
+    ``prefetch`` is called with the objects of the page before rendering.
+    """
 
-def list_page(list, request):
-    paginator = Paginator(list, settings.POSTS_TO_DISPLAY)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    if cursor_mode(request):
+        page_obj = cursor_page(
+            list, request.GET.get('cursor'), settings.POSTS_TO_DISPLAY, keys
+        )
+    else:
+        paginator = CachedCountPaginator(
+            list, settings.POSTS_TO_DISPLAY, count_key=count_key
+        )
+        page_obj = paginator.get_page(request.GET.get('page'))
+    if prefetch is not None:
+        prefetch(page_obj)
     return page_obj
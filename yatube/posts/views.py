@@ -1,89 +1,176 @@
+from urllib.parse import urlencode
+
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
 
+from .cache import (
+    author_scope, cached_page, conditional_page, feed_scopes, feed_version,
+    followed_authors, group_scope, post_detail_scopes
+)
+from .feed_merge import MergedFeed
 from .forms import PostForm, CommentForm
-from .models import Post, Group, User, Follow
-from .utils import list_page
+from .models import Comment, Post, Follow
+from .objects import cached_groups, cached_posts, cached_users, get_or_404
+from .search import search
+from .thumbnails import prefetch_thumbnails
+from .utils import (
+    COMMENT_CURSOR_KEYS, CachedCountPaginator, count_key, cursor_mode,
+    cursor_page, list_page
+)
 
 
-@cache_page(settings.CACHE_TIME_TO_LIVE, key_prefix='index_page')
+@cached_page('index')
 def index(request):
     post_list = Post.objects.select_related('group', 'author')
     context = {
-        'page_obj': list_page(post_list, request),
+        'page_obj': list_page(
+            post_list,
+            request,
+            count_key=count_key('index'),
+            prefetch=prefetch_thumbnails,
+        ),
     }
     return render(request, 'posts/index.html', context)
 
 
+@cached_page('profile', lambda username: [author_scope(username)])
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    following = (
-        not request.user.is_anonymous
-        and Follow.objects.filter(user=request.user, author=author).exists()
-    )
+    author = get_or_404(cached_users, username=username)
     post_list = author.posts.select_related('author', 'group')
     context = {
-        'page_obj': list_page(post_list, request),
+        'page_obj': list_page(
+            post_list,
+            request,
+            count_key=count_key('author', author.pk),
+            prefetch=prefetch_thumbnails,
+        ),
         'author': author,
         'is_profile': True,
-        'following': following
     }
     return render(request, 'posts/profile.html', context)
 
 
+@cached_page('post_detail', post_detail_scopes)
 def post_detail(request, post_id):
-    post = get_object_or_404(
-        Post.objects.select_related('group', 'author'),
-        pk=post_id
-    )
-    comments = post.comments.select_related('author')
-    form = CommentForm()
+    post = get_or_404(cached_posts, pk=post_id)
+    prefetch_thumbnails([post])
     context = {
         'post': post,
-        'comments': comments,
-        'form': form
+        'post_id': post.pk,
+        'comments': comments_page(post.pk, request.GET.get('comments')),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@cached_page('post_comments', post_detail_scopes)
+def post_comments(request, post_id):
+    """The comments after the cursor as an HTML fragment."""
+
+    comments = comments_page(post_id, request.GET.get('cursor'))
+    if not comments and not cached_posts.get_many([post_id]):
+        raise Http404('No such post.')
+    context = {
+        'post_id': post_id,
+        'comments': comments,
+    }
+    return render(request, 'includes/comment_list.html', context)
+
+
+def comments_page(post_id, cursor):
+    """A keyset page of the post comments, newest first; the first
+    page reads as few rows as any other."""
+
+    return cursor_page(
+        Comment.objects.filter(post_id=post_id).select_related('author'),
+        cursor,
+        settings.COMMENTS_TO_DISPLAY,
+        COMMENT_CURSOR_KEYS,
+    )
+
+
+@cached_page('group_list', lambda slug: [group_scope(slug)])
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
+    group = get_or_404(cached_groups, slug=slug)
     post_list = group.posts.select_related('group', 'author')
     template = 'posts/group_list.html'
     context = {
         'group': group,
-        'page_obj': list_page(post_list, request),
+        'page_obj': list_page(
+            post_list,
+            request,
+            count_key=count_key('group', group.pk),
+            prefetch=prefetch_thumbnails,
+        ),
     }
     return render(request, template, context)
 
 
+@cached_page('search', lambda: ['index'])
+def post_search(request):
+    query = request.GET.get('q', '').strip()
+    paginator = CachedCountPaginator(
+        search(query).select_related('author', 'group'),
+        settings.POSTS_TO_DISPLAY,
+    )
+    page_obj = paginator.get_page(request.GET.get('page'))
+    prefetch_thumbnails(page_obj)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
+@conditional_page(lambda request: feed_scopes(request.user.pk))
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
+    posts = Post.objects.select_related('author', 'group').filter(
+        feed_entries__user=request.user
+    ).order_by('-feed_entries__pub_date')
+    if settings.FEED_ENGINE == 'merge' and not cursor_mode(request):
+        authors = followed_authors(request.user.pk)
+        if len(authors) <= settings.FEED_MERGE_MAX_AUTHORS:
+            posts = MergedFeed(request.user.pk, posts)
     context = {
-        'page_obj': list_page(posts, request)
+        'page_obj': list_page(
+            posts,
+            request,
+            keys=('feed_entries__pub_date', 'feed_entries__pk'),
+            count_key=count_key(
+                'feed', f'{request.user.pk}:{feed_version(request)}'
+            ),
+            prefetch=prefetch_thumbnails,
+        )
     }
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
-    author = User.objects.get(username=username)
-    if request.user != author:
+    author = get_or_404(cached_users, username=username)
+    if request.user != author and author.pk not in followed_authors(
+        request.user.pk
+    ):
         Follow.objects.get_or_create(user=request.user, author=author)
     return redirect('posts:profile', username)
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
-    author = get_object_or_404(User, username=username)
-    Follow.objects.filter(user=request.user, author=author).delete()
+    author = get_or_404(cached_users, username=username)
+    if author.pk in followed_authors(request.user.pk):
+        Follow.objects.filter(user=request.user, author=author).delete()
     return redirect('posts:profile', username)
 
 
 @login_required
+@transaction.atomic
 def post_create(request):
     form = PostForm(
         request.POST or None,
@@ -98,8 +185,9 @@ def post_create(request):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_or_404(cached_posts, pk=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
@@ -111,8 +199,9 @@ def add_comment(request, post_id):
 
 @login_required
 def post_edit(request, post_id):
+    # The row is saved back, so it is read from the database.
     post = get_object_or_404(Post, pk=post_id)
-    if request.user != post.author:
+    if request.user.pk != post.author_id:
         return redirect('posts:post_detail', post_id=post_id)
     form = PostForm(
         request.POST or None,
@@ -0,0 +1,106 @@
+import logging
+import threading
+import time
+from multiprocessing import Pool
+
+import django
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection, connections
+from django.db.models import Count
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+from .models import Group, Post, User
+
+logger = logging.getLogger(__name__)
+# Pages of each kind rendered by default.
+SIZES = {'index': 5, 'groups': 10, 'profiles': 20, 'posts': 50}
+_warming = threading.Lock()
+
+
+def hot_urls(index=0, groups=0, profiles=0, posts=0):
+    """{kind: paths} of the pages first requested after a restart.
+
+    The first index pages, the groups with the most posts, the most
+    followed authors and the most commented posts.
+    """
+
+    index_url = reverse('posts:index')
+    return {
+        'index': [
+            f'{index_url}?page={number}' if number > 1 else index_url
+            for number in range(1, index + 1)
+        ],
+        'groups': [
+            reverse('posts:group_list', args=(slug,))
+            for slug in Group.objects.annotate(
+                total=Count('posts')
+            ).order_by('-total').values_list('slug', flat=True)[:groups]
+        ],
+        'profiles': [
+            reverse('posts:profile', args=(username,))
+            for username in User.objects.order_by(
+                '-stats__followers_count'
+            ).values_list('username', flat=True)[:profiles]
+        ],
+        'posts': [
+            reverse('posts:post_detail', args=(pk,))
+            for pk in Post.objects.order_by(
+                '-comments_count', '-pub_date'
+            ).values_list('pk', flat=True)[:posts]
+        ],
+    }
+
+
+def warm(path):
+    """Renders the page at ``path`` into the page cache as an anonymous
+    visitor would, returns its status code."""
+
+    request = RequestFactory().get(path)
+    request.user = AnonymousUser()
+    match = resolve(request.path_info)
+    return match.func(request, *match.args, **match.kwargs).status_code
+
+
+def warm_cache(paths, workers=1):
+    """Renders ``paths``, in a pool of worker processes if ``workers``
+    is above one, and returns their status codes.
+
+    Pool workers only help a cache shared between processes; a
+    per-process cache is warmed from within the server process.
+    """
+
+    if workers <= 1:
+        return [warm(path) for path in paths]
+    # Forked workers must not share the parent's database connection.
+    connections.close_all()
+    with Pool(workers, initializer=django.setup) as pool:
+        return pool.map(warm, paths, chunksize=4)
+
+
+def warm_after_startup(**kwargs):
+    """request_started receiver warming the cache in the background,
+    once per process, when CACHE_WARM_ON_STARTUP is set."""
+
+    if not _warming.acquire(blocking=False):
+        return
+
+    def run():
+        started = time.perf_counter()
+        try:
+            paths = [
+                path for paths in hot_urls(**SIZES).values()
+                for path in paths
+            ]
+            warm_cache(paths)
+        except Exception:
+            logger.exception('Cache warm-up failed')
+        else:
+            logger.info(
+                'Warmed %d pages in %.1fs',
+                len(paths), time.perf_counter() - started,
+            )
+        finally:
+            connection.close()
+
+    threading.Thread(target=run, name='warm-cache', daemon=True).start()
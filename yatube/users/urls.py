@@ -1,6 +1,7 @@
 from django.contrib.auth.views import LogoutView, LoginView, PasswordResetView
 from django.urls import path
 
+from core.queries import query_budget
 from . import views
 
 app_name = 'users'
@@ -8,20 +9,22 @@ app_name = 'users'
 urlpatterns = [
     path(
         'login/',
-        LoginView.as_view(template_name='users/login.html'),
+        query_budget(9)(LoginView.as_view(template_name='users/login.html')),
         name='login'
     ),
     path(
         'logout/',
-        LogoutView.as_view(template_name='users/logged_out.html'),
+        query_budget(4)(
+            LogoutView.as_view(template_name='users/logged_out.html')
+        ),
         name='logout'
     ),
-    path('signup/', views.SignUp.as_view(), name='signup'),
+    path('signup/', query_budget(3)(views.SignUp.as_view()), name='signup'),
     path(
         'password_reset/',
-        PasswordResetView.as_view(
+        query_budget(2)(PasswordResetView.as_view(
             template_name='users/password_reset_form.html'
-        ),
+        )),
         name='pwd_reset'
     ),
 
@@ -8,9 +8,44 @@ DEBUG = True
 
 POSTS_TO_DISPLAY = 10
 
+COMMENTS_TO_DISPLAY = 20
+
+# 'offset' shows numbered pages, 'cursor' uses keyset pagination.
+PAGINATION_MODE = 'offset'
+
 TEXT_LIMIT_FOR_STR = 15
 
-CACHE_TIME_TO_LIVE = 20
+# Cached pages are invalidated by signals, the timeout only bounds memory.
+CACHE_TIME_TO_LIVE = 60 * 60 * 6
+
+# An outdated page is rebuilt by a single request holding a lock while
+# the others get the previous copy; a crashed holder frees it this late.
+CACHE_STALE_WHILE_REVALIDATE = True
+CACHE_LOCK_TIMEOUT = 30
+
+# Render the hot pages in the background after the first request of a
+# worker process; ``manage.py warm_cache`` does the same on demand.
+CACHE_WARM_ON_STARTUP = False
+
+FEED_BATCH_SIZE = 1000
+
+# 'table' reads the subscription feed from the rows written when a post
+# is published, 'merge' merges the recent posts of the followed authors
+# on reading; pages past FEED_RECENT_POSTS per author and readers of
+# more than FEED_MERGE_MAX_AUTHORS authors use the table.
+FEED_ENGINE = 'table'
+FEED_RECENT_POSTS = 100
+FEED_MERGE_MAX_AUTHORS = 100
+
+# Count the queries of every request against the budget of its view,
+# development only: each query walks the stack to find its template.
+QUERY_BUDGET_CHECKS = DEBUG
+
+# Render uploaded images in the process_images workers, not in the request.
+IMAGE_PROCESSING_ASYNC = True
+
+# List lengths are dropped by signals, the timeout only bounds drift.
+LIST_COUNT_TIMEOUT = 60 * 60 * 24
 
 ALLOWED_HOSTS = [
     'localhost',
@@ -36,6 +71,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.queries.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
@@ -72,6 +108,9 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
+# Tests run against a cache of their own, see core.runner.
+TEST_RUNNER = 'core.runner.TestRunner'
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
@@ -94,9 +133,18 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# One cache for all the workers of the host. Its directory must be
+# private to the user running the site; in production point
+# CACHE_LOCATION into such a directory on tmpfs, e.g. under /dev/shm.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.SharedMemoryCache',
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION', os.path.join(BASE_DIR, 'cache', 'pages.sqlite3')
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': 20_000,
+        },
     }
 }
 